@@ -1,26 +1,185 @@
-from engine import start_engine
-start_engine()
+from engine import start_engine, get_engine, run_db, shutdown_db_executor, DB_POOL_SIZE, DB_WRITER_POOL_SIZE
 
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Annotated, Optional
 
 # app.py
-from fastapi import FastAPI, Request, HTTPException, status, Form, Depends
+from fastapi import FastAPI, Request, HTTPException, status, Form, Depends, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pathlib import Path
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 import db_utils
+import migrations
+import versions
+import events
+import principals
+import passwords
+import catalog
+import classmates
+import schedule
+import changes
+import metrics
+import ratelimit
+import assets
+from fastjson import FastJSONResponse
 
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 from new_bodies import NewStudent, NewAppointment, NewCourse
 import uvicorn
 import json
 
-app = FastAPI()
+### BACKGROUND TASKS =======================================================================
+
+# Seconds between passes of the appointment reaper
+REAPER_INTERVAL_SECONDS = float(os.environ.get("REAPER_INTERVAL_SECONDS", "60"))
+
+async def reap_appointments_forever(interval: float):
+    """Delete hanging and expired appointments (and old change_log rows) every `interval` seconds, off the request path."""
+    while True:
+        try:
+            removed = await run_db(db_utils.reap_appointments)
+            if removed:
+                print(f"Reaper removed {removed} appointment(s)")
+            await run_db(db_utils.prune_change_log)
+        except Exception as e:
+            print(f"Reaper pass failed: {e!r}")
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Here rather than at import: the password pool's spawned workers re-import this module
+    start_engine()
+    if assets.STATIC_FINGERPRINT:
+        assets.build({"/css": CSS_DIR, "/js": JS_DIR, "/IMG": IMG_DIR}, {"/html": HTML_DIR})
+    migrations.upgrade(get_engine())
+    # Follow cache invalidations from other workers and CLI tools
+    changes.listen(get_engine().url.database)
+    reaper = asyncio.create_task(reap_appointments_forever(REAPER_INTERVAL_SECONDS))
+    yield
+    reaper.cancel()
+    changes.stop()
+    shutdown_db_executor()
+    passwords.shutdown_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+### ADMISSION CONTROL =======================================================================
+
+# Never shed: long-lived streams (they hold no worker capacity) and the metrics scrape
+SHED_EXEMPT = ("/feed/stream", "/metrics")
+
+@app.middleware("http")
+async def shed_load(request: Request, call_next):
+    """Answer 503 straight away once MAX_IN_FLIGHT requests are being served, instead of queueing."""
+    if request.url.path in SHED_EXEMPT:
+        return await call_next(request)
+    if not ratelimit.admit():
+        return JSONResponse({"detail": "Server busy, try again shortly."}, status_code=503, headers={"Retry-After": "1"})
+    try:
+        return await call_next(request)
+    finally:
+        ratelimit.release()
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --forwarded-allow-ips so this is the real client
+    return request.client.host if request.client else "-"
+
+def client_key(request: Request) -> str:
+    """Who a request is charged to: the signed-in student (valid access token), else the client IP."""
+    auth = request.headers.get("authorization", "")
+    token = auth[7:] if auth[:7].lower() == "bearer " else request.query_params.get("token")
+    if token:
+        try:
+            return "student:" + jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])["sub"]
+        except (JWTError, KeyError):
+            pass
+    return "ip:" + client_ip(request)
+
+def too_many(wait: float) -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": ratelimit.retry_after(wait)})
+
+def rate_limit(budget: str):
+    """Route dependency charging each request to ratelimit.BUDGETS[budget]; 429 once it's spent."""
+    async def check(request: Request):
+        if (wait := ratelimit.take(budget, client_key(request))):
+            raise too_many(wait)
+    return Depends(check)
+
+### METRICS =======================================================================
+
+def route_label(scope: dict, status_code: int) -> str:
+    """The route template ("/course/{course_id}"), so metrics don't get one series per id."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if status_code == 404:
+        return "(unmatched)"
+    if status_code == 503:
+        return "(shed)"
+    # Static mounts: "/js/*"
+    return "/" + scope["path"].split("/")[1] + "/*"
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = metrics.begin_request(f"{request.method} {request.url.path}")
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.end_request(request.method, route_label(request.scope, status_code), status_code, elapsed, stats)
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+### DATABASE SESSION =======================================================================
+
+# Request sessions open at once, per engine. A request session keeps its pooled
+# connection between run_db calls, so this must not exceed that pool's size:
+# otherwise every DB thread can end up blocked on checkout while the sessions
+# holding connections wait for a thread to commit. Overflow connections are left
+# for sessionless calls (login, sign-up, reaper, catalog rebuilds), which never
+# wait on a thread.
+DB_REQUEST_SLOTS = min(int(os.environ.get("DB_REQUEST_SLOTS", str(DB_POOL_SIZE))), DB_POOL_SIZE)
+DB_WRITE_SLOTS = min(int(os.environ.get("DB_WRITE_SLOTS", str(DB_WRITER_POOL_SIZE))), DB_WRITER_POOL_SIZE)
+_db_slots = asyncio.Semaphore(DB_REQUEST_SLOTS)
+_db_write_slots = asyncio.Semaphore(DB_WRITE_SLOTS)
+
+# Requests that only read; their sessions use the read engine
+READ_METHODS = ("GET", "HEAD")
+
+async def get_db(request: Request):
+    """
+    One session and one transaction per request; handlers pass it to db_utils
+    as session=db. Committed as soon as the handler returns (before the response
+    is sent), rolled back if it raises. GET requests get a read-only session
+    whose reads all see one snapshot (see engine._begin_read).
+    """
+    readonly = request.method in READ_METHODS
+    async with (_db_slots if readonly else _db_write_slots):
+        db = db_utils.new_session(readonly)
+        try:
+            yield db
+            await run_db(db_utils.commit, db)
+        except BaseException:
+            await run_db(db_utils.rollback, db)
+            raise
+        finally:
+            await run_db(db.close)
+
+DBSession = Annotated[Session, Depends(get_db, scope="function")]
 
 ### LOGIN MECHANISM =======================================================================
 
@@ -31,8 +190,6 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -45,14 +202,25 @@ class TokenPayload(BaseModel):
     exp: int
 
 # Helpers
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+PASSWORD_POOL_BUSY = HTTPException(
+    status_code=503, detail="Too many sign-ins right now, try again shortly.", headers={"Retry-After": "1"}
+)
 
-def authenticate_student(email: str, password: str):
-    student_dict = db_utils.get_student_from_email(email)
-    verified = verify_password(password, student_dict['hashed_password'])
+# Sign-in and sign-up don't take a request session: they'd hold it through the Argon2 work
+async def authenticate_student(email: str, password: str):
+    student_dict = await run_db(db_utils.get_student_from_email, email)
+    try:
+        if student_dict is None:
+            await passwords.verify_dummy(password)
+            return None
+        verified, new_hash = await passwords.verify_password(password, student_dict['hashed_password'])
+    except passwords.PasswordPoolBusy:
+        raise PASSWORD_POOL_BUSY
     if not verified:
         return None
+    if new_hash:
+        # Stored hash used outdated Argon2 parameters
+        await run_db(db_utils.set_password_hash, student_dict['id'], new_hash)
     return student_dict
 
 def _create_token(subject: str, token_type: str, expires_delta: timedelta, key: str) -> str:
@@ -88,12 +256,17 @@ def decode_token(token: str, expected_type: str) -> TokenPayload:
 
 # Requests
 @app.post("/auth/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Accepts form fields: username, password (per OAuth2 spec).
+    Limited per client IP, and per account after failed attempts.
     """
-    user = authenticate_student(form_data.username, form_data.password)
+    account = form_data.username.strip().lower()
+    if (wait := ratelimit.peek("login_account", account) or ratelimit.take("login_ip", client_ip(request))):
+        raise too_many(wait)
+    user = await authenticate_student(form_data.username, form_data.password)
     if not user:
+        ratelimit.take("login_account", account)
         raise HTTPException(status_code=401, detail="Incorrect username or password... FUCK OFF")
 
     access = create_access_token(user['email'])
@@ -126,13 +299,30 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")  # expects Bearer t
 ### GETTERS/SETTERS - USER ====================================================
 
 # Dependency used by protected routes
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+async def get_current_user(db: DBSession, token: str = Depends(oauth2_scheme)) -> dict:
     payload = decode_token(token, expected_type="access")
     email = payload.sub
-    student_dict = db_utils.get_student_from_email(email)
+    if (cached := principals.get(email, payload.exp)) is not None:
+        return cached
+
+    generation = principals.generation()
+    student_dict = await run_db(db_utils.get_student_from_email, email, session=db)
     if not student_dict or student_dict.get("disabled", False):
         raise HTTPException(status_code=401, detail="Inactive or missing user")
-    return {k: v for k, v in student_dict.items() if k != 'hashed_password'}
+    user = {k: v for k, v in student_dict.items() if k != 'hashed_password'}
+    principals.put(email, payload.exp, user, generation)
+    return user
+
+# Conditional GET: the client sends back the ETag it last saw; if the versions
+# behind it haven't moved we answer 304 without touching the database
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    if versions.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
 
 @app.get('/current_user/')
 async def get_cur_user_endpoint(current_user: dict = Depends(get_current_user)):
@@ -142,115 +332,227 @@ async def get_cur_user_endpoint(current_user: dict = Depends(get_current_user)):
 class CoursesForStudent(BaseModel):
     course_ids: list[int]
 
-@app.post('/set_courses_for_student/')
-async def set_courses_for_student(body: CoursesForStudent, current_user: dict = Depends(get_current_user)):
+@app.post('/set_courses_for_student/', dependencies=[rate_limit("write")])
+async def set_courses_for_student(body: CoursesForStudent, db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    db_utils.set_courses_for_student(st_id, body.course_ids)
+    try:
+        await run_db(db_utils.set_courses_for_student, st_id, body.course_ids, session=db)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
-@app.post('/add_course_for_student/')
-async def add_course_for_student(course_id: int, current_user: dict = Depends(get_current_user)):
+@app.post('/add_course_for_student/', dependencies=[rate_limit("write")])
+async def add_course_for_student(course_id: int, db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    cur_course_ids = [c['id'] for c in db_utils.get_courses_for_student(st_id)]
-    
-    if course_id in cur_course_ids:
+    try:
+        added = await run_db(db_utils.add_course_for_student, st_id, course_id, session=db)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    if not added:
         raise HTTPException(status_code=403, detail="You're already in the course you're trying to join.")
-    
-    cur_course_ids.append(course_id)
-    db_utils.set_courses_for_student(st_id, cur_course_ids)
 
-@app.post('/remove_course_for_student/')
-async def remove_course_for_student(course_id: int, current_user: dict = Depends(get_current_user)):
+@app.post('/remove_course_for_student/', dependencies=[rate_limit("write")])
+async def remove_course_for_student(course_id: int, db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    cur_course_ids = [c['id'] for c in db_utils.get_courses_for_student(st_id)]
-    
-    if course_id not in cur_course_ids:
+    removed = await run_db(db_utils.remove_course_for_student, st_id, course_id, session=db)
+
+    if not removed:
         raise HTTPException(status_code=403, detail="You're not in the course you're trying to leave.")
-    
-    cur_course_ids.remove(course_id)
-    db_utils.set_courses_for_student(st_id, cur_course_ids)
 
 @app.get('/get_courses_for_student/')
-async def get_courses_for_student(current_user: dict = Depends(get_current_user)):
+async def get_courses_for_student(db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    courses = db_utils.get_courses_for_student(st_id)
+    courses = await run_db(db_utils.get_courses_for_student, st_id, session=db)
     return (courses)
 
+@app.get('/study_partners', dependencies=[rate_limit("feed")])
+async def study_partners(db: DBSession, current_user: dict = Depends(get_current_user), limit: int = Query(classmates.RECOMMEND_LIMIT, ge=1, le=100)):
+    """Classmates ranked by shared courses (from the in-memory index), and whether they host or attend an appointment."""
+    st_id = current_user['id']
+    if classmates.cached():
+        ranked = classmates.recommend(st_id, limit)
+    else:
+        ranked = await run_db(classmates.recommend, st_id, limit)
+    if not ranked:
+        return []
+    return FastJSONResponse(await run_db(db_utils.get_study_partners, ranked, session=db))
+
 # APPOINTMENTS
-@app.post('/create_appointment/')
-async def create_appointment(body: NewAppointment, current_user: dict = Depends(get_current_user)):
+@app.post('/create_appointment/', dependencies=[rate_limit("write")])
+async def create_appointment(body: NewAppointment, db: DBSession, current_user: dict = Depends(get_current_user)):
     try:
         creator_id = current_user['id']
-        aid = db_utils.create_appointment(
+        aid = await run_db(
+            db_utils.create_appointment,
             creator_id,
             body.course_id,
             body.start_time,
             body.end_time,
             body.location,
             body.additional_info,
+            session=db,
         )
         return aid
     except:
         raise HTTPException(403, "You are the owner of an existing appointment.")
 
-@app.post('/join_appointment/{appt_id}')
-async def join_appointment(appt_id: int, current_user: dict = Depends(get_current_user)):
+@app.post('/join_appointment/{appt_id}', dependencies=[rate_limit("write")])
+async def join_appointment(appt_id: int, db: DBSession, current_user: dict = Depends(get_current_user)):
     try:
         st_id = current_user['id']
-        db_utils.add_attendee_to_appointment(appt_id, st_id)
+        await run_db(db_utils.add_attendee_to_appointment, appt_id, st_id, session=db)
     except ValueError:
         raise HTTPException(403, detail="You are the owner of an existing appointment.")
 
-@app.post('/leave_appointment/')
-async def leave_appointment(current_user: dict = Depends(get_current_user)):
+@app.post('/leave_appointment/', dependencies=[rate_limit("write")])
+async def leave_appointment(db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    appt_dict = db_utils.get_student_appointment(st_id)
+    appt_dict = await run_db(db_utils.get_student_appointment, st_id, session=db)
 
     if appt_dict['creator_student_id'] == st_id:
         raise HTTPException(status_code=403, detail="You can't leave an appointment you created. End the appointment instead")
-    db_utils.remove_attendee_from_appointment(appt_dict['id'], st_id)
+    await run_db(db_utils.remove_attendee_from_appointment, appt_dict['id'], st_id, session=db)
     
-@app.post('/edit_appointment/')
-async def edit_appointment(body: NewAppointment, current_user: dict = Depends(get_current_user)):
+@app.post('/edit_appointment/', dependencies=[rate_limit("write")])
+async def edit_appointment(body: NewAppointment, db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    appt_dict = db_utils.get_student_appointment(st_id)
+    appt_dict = await run_db(db_utils.get_student_appointment, st_id, session=db)
 
     if st_id != appt_dict['creator_student_id']:
         raise HTTPException(status_code=403, detail="You are not the owner of this appointment")
     
-    db_utils.edit_appointment(
+    await run_db(
+        db_utils.edit_appointment,
         appt_dict['id'], 
         body.start_time,
         body.end_time,
         body.location,
         body.additional_info,
+        session=db,
     )
 
-@app.post('/end_appointment/')
-async def end_appointment(current_user: dict = Depends(get_current_user)):
+@app.post('/end_appointment/', dependencies=[rate_limit("write")])
+async def end_appointment(db: DBSession, current_user: dict = Depends(get_current_user)):
     st_id = current_user['id']
-    appt_dict = db_utils.get_student_appointment(st_id)
+    appt_dict = await run_db(db_utils.get_student_appointment, st_id, session=db)
 
     if appt_dict['creator_student_id'] != st_id:
         raise HTTPException(status_code=403, detail="You do not own this appointment")
 
-    db_utils.end_appointment(appt_dict['id'])
+    await run_db(db_utils.end_appointment, appt_dict['id'], session=db)
 
 
 
-@app.get('/feed')
-async def get_student_feed(current_user: dict = Depends(get_current_user)):
-    db_utils.clear_hanging_appointments()
+# Appointment lists (feed, per course) are paged with a keyset cursor over (start_time, id)
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
-    st_id = current_user['id']
+def time_window(
+    since: Optional[int] = Query(None, alias="from", description="Epoch seconds; only appointments not ended by then. Default: now"),
+    until: Optional[int] = Query(None, alias="to", description="Epoch seconds; only appointments starting before then"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> dict:
+    """
+    Window and page for an appointment list, as db_utils keyword arguments.
+    Without `from`, finished appointments are left out; the reaper deletes them
+    soon after anyway, and that bumps the course versions the ETags are built on.
+    """
+    after = None
+    if cursor:
+        try:
+            start, appt_id = cursor.split("_")
+            after = (int(start), int(appt_id))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Malformed cursor")
+    if since is None:
+        since = int(time.time())
+    return {"since": since, "until": until, "after": after, "limit": limit}
+
+def set_next_cursor(response: Response, rows: list[dict], window: dict):
+    """A full page may have more after it; point the client at the next one."""
+    if len(rows) == window["limit"]:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = f"{last['start_time']}_{last['id']}"
+
+@app.get('/feed', dependencies=[rate_limit("feed")])
+async def get_student_feed(request: Request, response: Response, db: DBSession, current_user: dict = Depends(get_current_user), window: dict = Depends(time_window)):
+    etag = versions.courses_etag(current_user['courses'], request.url.query)
+    if (cached := not_modified(request, etag)):
+        return cached
+    set_etag(response, etag)
 
-    student_courses = db_utils.get_courses_for_student(st_id)
-    
-    appointments = []
-    for c in student_courses:
-        c_id = c['id']
-        appointments += db_utils.get_appointments_for_course(c_id)
-    
-    return appointments
+    st_id = current_user['id']
+    feed = await run_db(db_utils.get_feed_for_student, st_id, **window, session=db)
+    set_next_cursor(response, feed, window)
+    return FastJSONResponse(feed, headers=response.headers)
+
+@app.get('/appointments/active', dependencies=[rate_limit("feed")])
+async def active_appointments(
+    db: DBSession,
+    current_user: dict = Depends(get_current_user),
+    at: Optional[int] = Query(None, description="Epoch seconds; appointments running at that moment. Default: now"),
+    since: Optional[int] = Query(None, alias="from", description="Epoch seconds; with `to`, appointments overlapping [from, to)"),
+    until: Optional[int] = Query(None, alias="to"),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Appointments in the student's courses happening at `at` or during
+    [`from`, `to`), soonest first, found with the in-memory interval index.
+    """
+    if at is not None and (since is not None or until is not None):
+        raise HTTPException(status_code=422, detail="Pass either at or from/to, not both")
+    if since is None and until is None:
+        since = at if at is not None else int(time.time())
+        until = since + 1
+    elif since is None or until is None:
+        raise HTTPException(status_code=422, detail="from and to go together")
+    elif until <= since:
+        raise HTTPException(status_code=422, detail="to must be after from")
+
+    course_ids = current_user['courses']
+    if schedule.cached():
+        ids = schedule.active(course_ids, since, until, limit)
+    else:
+        ids = await run_db(schedule.active, course_ids, since, until, limit)
+    if not ids:
+        return []
+    return FastJSONResponse(await run_db(db_utils.get_feed_entries, ids, session=db))
+
+# Seconds between SSE keep-alive comments, so proxies don't drop idle streams
+STREAM_KEEPALIVE_SECONDS = 25
+
+@app.get('/feed/stream', dependencies=[rate_limit("stream")])
+async def stream_student_feed(db: DBSession, token: str = Query(...)):
+    """
+    Server-sent events carrying appointment deltas for the student's courses:
+    {"type": "created"|"edited"|"joined"|"left"|"ended", "appointment_id", "course_id", ...}
+    or {"type": "resync"} when the client should redraw from /feed.
+    EventSource can't send headers, so the access token comes as a query param.
+    The stream closes when the token expires; the client refreshes and reconnects.
+    """
+    payload = decode_token(token, expected_type="access")
+    current_user = await get_current_user(db, token)
+    sub = events.subscribe(current_user['id'], current_user['courses'])
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while (remaining := payload.exp - datetime.now(timezone.utc).timestamp()) > 0:
+                try:
+                    data = await asyncio.wait_for(sub.queue.get(), timeout=min(STREAM_KEEPALIVE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {data}\n\n"
+        finally:
+            events.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 #  ===========================================================================
@@ -261,13 +563,22 @@ CSS_DIR   = BASE_DIR / "css"
 JS_DIR    = BASE_DIR / "js"
 IMG_DIR    = BASE_DIR / "IMG"
 
-app.mount("/css", StaticFiles(directory=CSS_DIR), name="css")
-app.mount("/js",  StaticFiles(directory=JS_DIR),  name="js")
-app.mount("/html",  StaticFiles(directory=HTML_DIR), name="html")
-app.mount("/IMG",  StaticFiles(directory=IMG_DIR), name="IMG")
+if assets.STATIC_FINGERPRINT:
+    # Hashed, precompressed, immutable assets, built in lifespan; see assets.py
+    app.mount("/css", assets.AssetFiles("/css", directory=CSS_DIR), name="css")
+    app.mount("/js",  assets.AssetFiles("/js", directory=JS_DIR),  name="js")
+    app.mount("/html",  assets.AssetFiles("/html", directory=HTML_DIR), name="html")
+    app.mount("/IMG",  assets.AssetFiles("/IMG", directory=IMG_DIR), name="IMG")
+else:
+    app.mount("/css", StaticFiles(directory=CSS_DIR), name="css")
+    app.mount("/js",  StaticFiles(directory=JS_DIR),  name="js")
+    app.mount("/html",  StaticFiles(directory=HTML_DIR), name="html")
+    app.mount("/IMG",  StaticFiles(directory=IMG_DIR), name="IMG")
 
 @app.get("/")
-async def root():
+async def root(request: Request):
+    if (index := assets.shell("/html/index.html", request.headers)):
+        return index
     index = HTML_DIR / "index.html"
     if index.exists():
         return FileResponse(index, media_type="text/html; charset=utf-8")
@@ -282,84 +593,153 @@ async def login_page(request: Request):
     return FileResponse("static/tests.html")
 
 @app.get("/appointment/{appt_id}")
-async def get_appointment_dict(appt_id: int):
-    appt_dict = db_utils.get_appointment_dict(appt_id)
+async def get_appointment_dict(appt_id: int, db: DBSession):
+    appt_dict = await run_db(db_utils.get_appointment_dict, appt_id, session=db)
     return appt_dict
 
 @app.get("/course/{course_id}")
-async def get_course_dict(course_id: int):
-    course_dict = db_utils.get_course_dict(course_id)
+async def get_course_dict(course_id: int, request: Request, response: Response, db: DBSession):
+    etag = versions.course_etag(course_id)
+    if (cached := not_modified(request, etag)):
+        return cached
+    set_etag(response, etag)
+
+    course_dict = await run_db(db_utils.get_course_dict, course_id, session=db)
     return course_dict
 
+# Batch lookups: ?ids=1,2,3 resolves any number of ids in one query
+MAX_BATCH_IDS = 500
+
+def parse_ids(ids: str = Query(..., description="Comma-separated ids")) -> list[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return parsed
+
+@app.get("/courses")
+async def get_courses(db: DBSession, ids: list[int] = Depends(parse_ids)):
+    return await run_db(db_utils.get_courses_by_ids, ids, session=db)
+
+@app.get("/appointments")
+async def get_appointments(db: DBSession, ids: list[int] = Depends(parse_ids)):
+    return await run_db(db_utils.get_appointments_by_ids, ids, session=db)
+
+@app.get("/students/public")
+async def get_public_students(db: DBSession, ids: list[int] = Depends(parse_ids)):
+    return await run_db(db_utils.get_public_students, ids, session=db)
+
 # * Not Authed
-@app.post("/create_student/")
+@app.post("/create_student/", dependencies=[rate_limit("signup")])
 async def create_student(body: NewStudent):
-    student_id = db_utils.create_student(body.name, body.email, body.password)
+    try:
+        hashed_password = await passwords.hash_password(body.password)
+    except passwords.PasswordPoolBusy:
+        raise PASSWORD_POOL_BUSY
+    student_id = await run_db(db_utils.create_student, body.name, body.email, hashed_password)
     print(student_id)
     return student_id
 
-@app.get('/get_appointments_for_course/{id}')
-async def get_appointments_for_courses(id: int):
-    appointments = db_utils.get_appointments_for_course(id)
-    return (appointments)
+@app.get('/get_appointments_for_course/{id}', dependencies=[rate_limit("feed")])
+async def get_appointments_for_courses(id: int, request: Request, response: Response, db: DBSession, window: dict = Depends(time_window)):
+    etag = versions.course_etag(id, request.url.query)
+    if (cached := not_modified(request, etag)):
+        return cached
+    set_etag(response, etag)
+
+    appointments = await run_db(db_utils.get_appointments_for_course, id, **window, session=db)
+    set_next_cursor(response, appointments, window)
+    return FastJSONResponse(appointments, headers=response.headers)
 
 @app.get('/get_attending_students/{aid}')
-async def get_attending_students(aid: int):
+async def get_attending_students(aid: int, db: DBSession):
     try:
-        attendees = db_utils.get_attending_students(aid)
+        attendees = await run_db(db_utils.get_attending_students, aid, session=db)
         return (attendees)
     except ValueError:
         raise HTTPException(status_code=404, detail=f"No appointment with ID {aid}")
     
 @app.get('/get_creator/{aid}')
-async def get_creator(aid: int):
+async def get_creator(aid: int, db: DBSession):
     try:
-        creator = db_utils.get_creator(aid)
+        creator = await run_db(db_utils.get_creator, aid, session=db)
         return (creator)
     except ValueError:
         raise HTTPException(status_code=404, detail=f"No appointment with ID {aid}")
 
 @app.get('/all_courses')
-async def all_courses():
-    return [{
-        k: v for k, v in c.items() if k != 'students'
-    } for c in db_utils.get_all_courses()]
-
-@app.get("/debug/db_all")
-async def debug_db_all():
+async def all_courses(request: Request):
+    """The whole catalog, served from bytes serialized and gzipped once per change."""
+    cat = catalog.cached() or await run_db(catalog.get)
+    if (cached := not_modified(request, cat.etag)):
+        return cached
+    headers = {"ETag": cat.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(cat.gzip_bytes, media_type="application/json", headers=headers)
+    return Response(cat.json_bytes, media_type="application/json", headers=headers)
+
+@app.get('/courses/search', dependencies=[rate_limit("search")])
+async def search_courses(q: str, limit: int = Query(catalog.SEARCH_LIMIT, ge=1, le=100)):
+    cat = catalog.cached() or await run_db(catalog.get)
+    return FastJSONResponse(cat.search(q, limit))
+
+@app.get("/debug/db_all", dependencies=[rate_limit("debug")])
+async def debug_db_all(db: DBSession):
     """
     Returns a snapshot of all major tables.
     This is for testing only — remove or protect it in production.
     """
     try:
-        students = db_utils.get_all_students()
+        students = await run_db(db_utils.get_all_students, session=db)
     except Exception:
         students = "Unavailable"
 
     try:
-        courses = db_utils.get_all_courses()
+        courses = await run_db(db_utils.get_all_courses, session=db)
     except Exception:
         courses = "Unavailable"
 
     try:
-        appointments = db_utils.get_all_appointments()
+        appointments = await run_db(db_utils.get_all_appointments, session=db)
     except Exception:
         appointments = "Unavailable"
 
-    return {
+    return FastJSONResponse({
         "students": students,
         "appointments": appointments,
         "courses": courses
-    }
+    })
 
 
 import socket
 if __name__ == "__main__":
+    # python app.py                  one process, reloads on code changes (development)
+    # python app.py --workers 4      one process per core, sharing main.db (production)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the Tandem server")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="worker processes; more than one turns off reloading")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "80")))
+    parser.add_argument("--graceful-timeout", type=float, default=10,
+                        help="seconds to wait for open feed streams on shutdown (multi-worker mode)")
+    args = parser.parse_args()
 
     hostname = socket.gethostname()
     ip_address = socket.gethostbyname(hostname)
     print(f"Join up in {ip_address}")
 
-    uvicorn.run("app:app", host="0.0.0.0", port=80, log_level="info", reload=True)
+    if args.workers > 1:
+        # Migrate once here rather than in every worker at the same moment
+        start_engine()
+        migrations.upgrade(get_engine())
+        get_engine().dispose()
+        uvicorn.run("app:app", host="0.0.0.0", port=args.port, log_level="info",
+                    workers=args.workers, timeout_graceful_shutdown=args.graceful_timeout)
+    else:
+        uvicorn.run("app:app", host="0.0.0.0", port=args.port, log_level="info", reload=True)
 
     print("Bye bye!")
\ No newline at end of file
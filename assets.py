@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+import versions
+
+# Fingerprinted static assets. build() reads css/, js/ and IMG/ once at startup:
+#   - every file is also served as name.<hash>.ext with a year-long immutable
+#     Cache-Control, so browsers fetch it once per content change
+#   - text assets are gzipped (and brotli-compressed, if the brotli package is
+#     installed) here, once, instead of per request
+#   - the HTML shells in html/ are rewritten to reference the hashed names and
+#     served from memory with an ETag and no-cache, so a deploy shows up on
+#     the next page view at the cost of one 304
+# Plain names keep working and revalidate like the shells. Files are not
+# re-read after build(); set STATIC_FINGERPRINT=0 while editing them.
+#   python assets.py        # print the manifest and compressed sizes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "1") != "0"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE = {".css", ".js", ".html", ".svg", ".json", ".txt"}
+HASH_LENGTH = 12
+
+# Root-relative references to assets inside quotes or url(...)
+_REFERENCE = re.compile(r"""(?<=["'(])/(?:css|js|IMG)/[^"'()?#\s]+""")
+
+class Asset:
+    __slots__ = ("path", "media_type", "etag", "body", "gzip", "br")
+
+    def __init__(self, path: Path, digest: str, body: Optional[bytes]):
+        self.path = path
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.etag = f'"{digest}"'
+        self.body = body  # None: streamed from disk (images)
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0) if body is not None else None
+        self.br = brotli.compress(body) if body is not None and brotli is not None else None
+
+    def respond(self, request_headers: Headers, cache_control: str) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": cache_control}
+        if self.body is not None:
+            headers["Vary"] = "Accept-Encoding"
+        if versions.etag_matches(request_headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        if self.body is None:
+            return FileResponse(self.path, media_type=self.media_type, headers=headers)
+
+        accept = request_headers.get("accept-encoding", "")
+        body = self.body
+        if self.br is not None and "br" in accept:
+            body, headers["Content-Encoding"] = self.br, "br"
+        elif "gzip" in accept:
+            body, headers["Content-Encoding"] = self.gzip, "gzip"
+        return Response(body, media_type=self.media_type, headers=headers)
+
+# url -> (asset, Cache-Control) for everything build() took over
+_served: dict[str, tuple[Asset, str]] = {}
+# plain url -> hashed url
+manifest: dict[str, str] = {}
+
+def _hashed_url(url: str, digest: str) -> str:
+    base, dot, ext = url.rpartition(".")
+    if not dot or "/" in ext:
+        return f"{url}.{digest}"
+    return f"{base}.{digest}.{ext}"
+
+def rewrite(text: str) -> str:
+    """Point every /css, /js and /IMG reference in `text` at its hashed name."""
+    return _REFERENCE.sub(lambda m: manifest.get(m.group(0), m.group(0)), text)
+
+def build(assets: dict[str, Path], shells: dict[str, Path]):
+    """
+    Fingerprint the files under each assets prefix ("/js": js dir, ...) and load
+    the HTML shells under each shells prefix, rewritten to the hashed names.
+    """
+    _served.clear()
+    manifest.clear()
+    for prefix, directory in assets.items():
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file():
+                continue
+            url = f"{prefix}/{path.relative_to(directory).as_posix()}"
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            asset = Asset(path, digest, data if path.suffix in COMPRESSIBLE else None)
+            manifest[url] = _hashed_url(url, digest)
+            _served[manifest[url]] = (asset, IMMUTABLE)
+            _served[url] = (asset, REVALIDATE)
+
+    for prefix, directory in shells.items():
+        for path in sorted(directory.rglob("*.html")):
+            url = f"{prefix}/{path.relative_to(directory).as_posix()}"
+            body = rewrite(path.read_text(encoding="utf-8")).encode()
+            digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+            _served[url] = (Asset(path, digest, body), REVALIDATE)
+
+def shell(url: str, request_headers: Headers) -> Optional[Response]:
+    """A built shell ("/html/index.html") as a response, or None if build() doesn't know it."""
+    entry = _served.get(url)
+    if entry is None:
+        return None
+    asset, cache_control = entry
+    return asset.respond(request_headers, cache_control)
+
+class AssetFiles(StaticFiles):
+    """StaticFiles for a mount build() covered: serves its files from memory, anything else from disk."""
+
+    def __init__(self, prefix: str, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            response = shell(f"{self.prefix}/{path}", Headers(scope=scope))
+            if response is not None:
+                return response
+        return await super().get_response(path, scope)
+
+if __name__ == "__main__":
+    base = Path(__file__).parent.resolve()
+    build({p: base / p.strip("/") for p in ("/css", "/js", "/IMG")}, {"/html": base / "html"})
+    for url, hashed in manifest.items():
+        asset = _served[hashed][0]
+        size = asset.path.stat().st_size
+        if asset.body is None:
+            print(f"{hashed:<44} {size:>9,}")
+        else:
+            br = f"  br {len(asset.br):>7,}" if asset.br is not None else ""
+            print(f"{hashed:<44} {size:>9,}  gzip {len(asset.gzip):>7,}{br}")
+    print(f"{len(manifest)} assets; brotli {'on' if brotli else 'off (pip install brotli)'}")
@@ -0,0 +1,118 @@
+import gzip
+import re
+import threading
+from bisect import bisect_left
+from typing import Optional
+
+import fastjson
+
+# Course catalog cache. The whole catalog is serialized and gzipped once per
+# change (db_utils.create_course and bulk imports call invalidate()), and an
+# in-memory index over code and name serves /courses/search without SQL:
+#   - a sorted token list (code, code without spaces, each name word) for prefix hits
+#   - a trigram -> course postings map for substring hits
+
+SEARCH_LIMIT = 20
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class Catalog:
+    def __init__(self, courses: list[dict], version: int):
+        self.courses = courses
+        self.version = version
+        self.etag = f'"catalog-{version}"'
+        self.json_bytes = fastjson.dumps(courses)
+        self.gzip_bytes = gzip.compress(self.json_bytes, compresslevel=9)
+
+        self._texts = []  # normalized "code name" per course, for substring checks
+        self._codes = []  # normalized code per course, spaced and compact
+        tokens = []
+        self._grams: dict[str, set[int]] = {}
+        for i, c in enumerate(courses):
+            code, name = _norm(c["code"]), _norm(c["name"])
+            text = f"{code} {name}"
+            self._texts.append(text)
+            self._codes.append((code, code.replace(" ", "")))
+            for tok in {code, code.replace(" ", ""), *name.split()}:
+                tokens.append((tok, i))
+            for g in _trigrams(text) | _trigrams(code.replace(" ", "")):
+                self._grams.setdefault(g, set()).add(i)
+        tokens.sort()
+        self._tokens = tokens
+        self._token_keys = [t for t, _ in tokens]
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list[dict]:
+        """
+        Top `limit` courses matching `query`, best first: exact code, code prefix,
+        name-word prefix, then substring anywhere in code or name.
+        """
+        q = _norm(query)
+        if not q:
+            return []
+        compact = q.replace(" ", "")
+        ranked: dict[int, int] = {}
+
+        def hit(i: int, rank: int):
+            if rank < ranked.get(i, 99):
+                ranked[i] = rank
+
+        for key in {q, compact}:
+            start = bisect_left(self._token_keys, key)
+            for tok, i in self._tokens[start:]:
+                if not tok.startswith(key):
+                    break
+                if tok in self._codes[i]:
+                    hit(i, 0 if tok == key else 1)
+                else:
+                    hit(i, 2)
+
+        if len(q) >= 3:
+            grams = sorted((self._grams.get(g, set()) for g in _trigrams(q)), key=len)
+            candidates = set.intersection(*grams) if grams and grams[0] else set()
+            for i in candidates:
+                if q in self._texts[i]:
+                    hit(i, 3)
+
+        best = sorted(ranked, key=lambda i: (ranked[i], self.courses[i]["code"]))
+        return [self.courses[i] for i in best[:limit]]
+
+_lock = threading.Lock()
+_current: Optional[Catalog] = None
+# Id of the last change that touched the catalog, as for course versions (see versions.py)
+_version = 0
+# Bumped on every invalidation so a build that raced with one isn't published
+_generation = 0
+
+def get() -> Catalog:
+    """The current catalog, rebuilt from the database if something invalidated it."""
+    global _current
+    cat = _current
+    if cat is not None:
+        return cat
+    import db_utils
+
+    with _lock:
+        if _current is None:
+            generation, version = _generation, _version
+            courses = db_utils.get_all_courses()
+            cat = Catalog(courses, version)
+            # Only publish if nothing changed while we were reading
+            if generation == _generation:
+                _current = cat
+            return cat
+        return _current
+
+def cached() -> Optional[Catalog]:
+    """The current catalog if it is built, without touching the database."""
+    return _current
+
+def invalidate(version: int):
+    """Drop the catalog after change `version` touched it."""
+    global _current, _version, _generation
+    _generation += 1
+    _version = max(_version, version)
+    _current = None
@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from sqlalchemy import delete, insert
+
+from db_spec import change_log
+import catalog
+import classmates
+import events
+import principals
+import schedule
+import versions
+
+# Cross-process cache invalidation, so several app workers can share main.db.
+# Every process keeps state derived from the database in memory: cached
+# principals, the catalog, the course versions behind ETags, the classmates and
+# appointment-time indexes and the open feed streams. A write describes what it invalidated as a
+# list of [kind, args, kwargs] changes; db_utils.commit() stores that list as
+# one change_log row in the same transaction and applies it locally after the
+# commit. listen() runs a thread in each server process. The thread checks
+# PRAGMA data_version on a private connection, which costs no I/O until some
+# other connection commits. It then replays the rows other processes wrote.
+# Each row's id doubles as the version of what it changed (versions.py,
+# catalog.py), so every process labels the same data with the same ETag.
+#
+# CLI tools (importer) write change_log rows too, so a running server picks up
+# their changes without a restart.
+
+# How often each server process checks for other processes' commits
+CHANGE_POLL_SECONDS = float(os.environ.get("CHANGE_POLL_SECONDS", "0.05"))
+# The reaper prunes older rows; a listener that falls further behind resets everything
+CHANGE_LOG_RETENTION_SECONDS = int(os.environ.get("CHANGE_LOG_RETENTION_SECONDS", "600"))
+
+ORIGIN = uuid.uuid4().hex  # this process
+
+def reset(version: int):
+    """Drop everything derived from the database. For bulk imports and listeners that missed changes."""
+    versions.bump_all(version)
+    principals.invalidate_all()
+    catalog.invalidate(version)
+    classmates.invalidate()
+    schedule.invalidate()
+    # Streams keep their course index until they reconnect (at most one token lifetime)
+    events.resync_all()
+
+def enrollment(student_id: int, course_ids: list[int]):
+    """A student's courses are now exactly `course_ids`."""
+    events.set_student_courses(student_id, course_ids)
+    classmates.set_student_courses(student_id, course_ids)
+
+_handlers: dict[str, Callable] = {
+    "courses": versions.bump_courses,
+    "students": principals.invalidate_students,
+    "catalog": catalog.invalidate,
+    "enrollment": enrollment,
+    "scheduled": schedule.put,
+    "unscheduled": schedule.drop,
+    "reset": reset,
+}
+# Kinds whose handler also takes version=, the id of the change_log row
+_VERSIONED = {"courses", "catalog", "reset"}
+
+def register(kind: str, handler: Callable):
+    """Add a change kind; `handler` must take JSON-compatible arguments."""
+    _handlers[kind] = handler
+
+def record(conn, changed: list) -> int:
+    """
+    Log `changed` in the caller's transaction (a Session or Connection), for the
+    other processes. Returns the row id, to pass to apply() once committed.
+    """
+    return conn.execute(insert(change_log).values(
+        origin=ORIGIN, created_at=int(time.time()), payload=json.dumps(changed),
+    ).returning(change_log.c.id)).scalar_one()
+
+def apply(changed: list, change_id: int) -> None:
+    """
+    Run each change's handler. The write behind them has already committed, so
+    a failing handler is logged and skipped rather than failing the request or
+    the changes after it.
+    """
+    for kind, args, kwargs in changed:
+        try:
+            if kind in _VERSIONED:
+                kwargs = {**kwargs, "version": change_id}
+            _handlers[kind](*args, **kwargs)
+        except Exception as e:
+            print(f"Applying {kind} change failed: {e!r}")
+
+def prune(conn) -> int:
+    """Delete rows older than CHANGE_LOG_RETENTION_SECONDS. Returns how many."""
+    cutoff = int(time.time()) - CHANGE_LOG_RETENTION_SECONDS
+    return conn.execute(delete(change_log).where(change_log.c.created_at < cutoff)).rowcount
+
+# --- Listener ---
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+def _last_id(conn: sqlite3.Connection) -> int:
+    # The AUTOINCREMENT counter survives pruning, unlike max(id)
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+def _replay(conn: sqlite3.Connection, last_id: int) -> int:
+    """Apply other processes' rows after `last_id`. Returns the new last id."""
+    rows = conn.execute(
+        "SELECT id, origin, payload FROM change_log WHERE id > ? ORDER BY id", (last_id,)
+    ).fetchall()
+    # Writers commit one at a time, so ids arrive without holes unless the reaper pruned some
+    if rows and rows[0][0] != last_id + 1:
+        print(f"Change log skipped from {last_id} to {rows[0][0]}; resetting caches")
+        reset(rows[0][0] - 1)
+    for change_id, origin, payload in rows:
+        if origin != ORIGIN:
+            try:
+                apply(json.loads(payload), change_id)
+            except Exception as e:
+                print(f"Change {change_id} failed: {e!r}")
+        last_id = change_id
+    return last_id
+
+def _listen(conn: sqlite3.Connection, last_id: int, version: int):
+    while not _stop.wait(CHANGE_POLL_SECONDS):
+        try:
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != version:
+                version = current
+                last_id = _replay(conn, last_id)
+        except sqlite3.Error as e:
+            print(f"Change listener failed: {e!r}")
+    conn.close()
+
+def listen(db_path: str):
+    """Start following other processes' changes to the database at `db_path`."""
+    global _thread
+    if _thread is not None:
+        return
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    # Read the starting point now, so nothing committed after startup is missed
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    last_id = _last_id(conn)
+    # Start every version at the current change id, like every other worker
+    reset(last_id)
+    _stop.clear()
+    _thread = threading.Thread(target=_listen, args=(conn, last_id, version), name="changes", daemon=True)
+    _thread.start()
+
+def stop():
+    global _thread
+    if _thread is not None:
+        _stop.set()
+        _thread.join()
+        _thread = None
@@ -0,0 +1,94 @@
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+
+# Study-partner index. An in-memory inverted index of student_courses
+# (course -> enrolled students, plus each student's courses) is built from the
+# database on first use and then kept current by the "enrollment" change that
+# db_utils queues whenever a student's courses change (see changes.py), so
+# ranking classmates by shared courses never touches SQL.
+
+RECOMMEND_LIMIT = 20
+
+class Index:
+    def __init__(self, pairs: Iterable[tuple[int, int]]):
+        self.by_course: dict[int, set[int]] = {}
+        self.by_student: dict[int, frozenset[int]] = {}
+        courses: dict[int, set[int]] = {}
+        for student_id, course_id in pairs:
+            self.by_course.setdefault(course_id, set()).add(student_id)
+            courses.setdefault(student_id, set()).add(course_id)
+        for student_id, course_ids in courses.items():
+            self.by_student[student_id] = frozenset(course_ids)
+
+    def set(self, student_id: int, course_ids: Iterable[int]):
+        new = frozenset(course_ids)
+        old = self.by_student.get(student_id, frozenset())
+        for cid in old - new:
+            students = self.by_course.get(cid)
+            if students is not None:
+                students.discard(student_id)
+                if not students:
+                    del self.by_course[cid]
+        for cid in new - old:
+            self.by_course.setdefault(cid, set()).add(student_id)
+        if new:
+            self.by_student[student_id] = new
+        else:
+            self.by_student.pop(student_id, None)
+
+    def rank(self, student_id: int, limit: int) -> list[tuple[int, list[int]]]:
+        """Up to `limit` (classmate id, shared course ids), most shared courses first, then by id."""
+        mine = self.by_student.get(student_id, frozenset())
+        shared: Counter[int] = Counter()
+        for cid in mine:
+            shared.update(self.by_course.get(cid, ()))
+        shared.pop(student_id, None)
+        best = sorted(shared.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(sid, sorted(mine & self.by_student[sid])) for sid, _ in best]
+
+_lock = threading.Lock()
+_current: Optional[Index] = None
+# Bumped on every update so a build that raced with one isn't published
+_generation = 0
+
+def get() -> Index:
+    """The index, built from the database on first use."""
+    global _current
+    idx = _current
+    if idx is not None:
+        return idx
+    import db_utils
+
+    with _lock:
+        generation = _generation
+    idx = Index(db_utils.get_enrollments())
+    with _lock:
+        if _current is None and generation == _generation:
+            _current = idx
+        return _current or idx
+
+def cached() -> Optional[Index]:
+    """The index if it is built, without touching the database."""
+    return _current
+
+def recommend(student_id: int, limit: int = RECOMMEND_LIMIT) -> list[tuple[int, list[int]]]:
+    """Classmates of `student_id` ranked by shared courses, as (student id, shared course ids)."""
+    idx = get()
+    with _lock:
+        return idx.rank(student_id, limit)
+
+def set_student_courses(student_id: int, course_ids: Iterable[int]):
+    """Apply a student's new enrollment. Call only after it committed."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if _current is not None:
+            _current.set(student_id, course_ids)
+
+def invalidate():
+    """Drop the index; the next recommend() rebuilds it."""
+    global _current, _generation
+    with _lock:
+        _generation += 1
+        _current = None
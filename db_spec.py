@@ -1,11 +1,15 @@
 # university_sched_sa.py
 from pathlib import Path
+from typing import Optional, TypedDict
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Text, ForeignKey, Table
+    create_engine, make_url, Column, Integer, String, Text, ForeignKey, Table, Index
 )
 from sqlalchemy.orm import declarative_base, relationship, Session
 
-DB_FILE = Path("main.db")
+from engine import DATABASE_URL
+
+# The primary database file, from the same DATABASE_URL setting the app uses
+DB_FILE = Path(make_url(DATABASE_URL).database)
 
 Base = declarative_base()
 
@@ -15,6 +19,19 @@ student_courses = Table(
     Base.metadata,
     Column("student_id", ForeignKey("students.id", ondelete="CASCADE"), primary_key=True),
     Column("course_id",  ForeignKey("courses.id",  ondelete="CASCADE"), primary_key=True),
+    # Reverse lookup: who is enrolled in a course
+    Index("ix_student_courses_course_id", "course_id", "student_id"),
+)
+
+# Cache invalidations and live-feed events for other processes; see changes.py
+change_log = Table(
+    "change_log",
+    Base.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("origin", String, nullable=False),       # writing process
+    Column("created_at", Integer, nullable=False),  # Unix epoch seconds
+    Column("payload", Text, nullable=False),        # JSON list of [kind, args, kwargs]
+    sqlite_autoincrement=True,
 )
 
 class Student(Base):
@@ -27,16 +44,6 @@ class Student(Base):
     # A student can attend at most one appointment
     appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="SET NULL"), nullable=True, index=True)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "email": self.email,
-            "appointment_id": self.appointment_id,
-            "hashed_password": self.hashed_password,
-            "courses": [c.id for c in self.courses]
-        }
-
     # ORM relationships
     courses = relationship("Course", secondary=student_courses, back_populates="students")
     appointment = relationship("Appointment", back_populates="attendees", foreign_keys=[appointment_id])
@@ -47,55 +54,106 @@ class Course(Base):
     code = Column(String, unique=True, nullable=False)
     name = Column(String, nullable=False)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "code": self.code,
-            "name": self.name,
-            "students": [st.id for st in self.students]
-        }
-
     students = relationship("Student", secondary=student_courses, back_populates="courses")
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Per-course feed, ordered and paged by (start_time, id)
+        Index("ix_appointments_course_id_start_time", "course_id", "start_time"),
+        # Time-window filters and the expiry reaper
+        Index("ix_appointments_end_time", "end_time"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
-    creator_student_id = Column(Integer, ForeignKey("students.id", ondelete="SET NULL"), nullable=True)
+    creator_student_id = Column(Integer, ForeignKey("students.id", ondelete="SET NULL"), nullable=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id", ondelete="SET NULL"), nullable=True)
-    start_time = Column(String)       # store as ISO-8601 TEXT
-    end_time = Column(String)
+    start_time = Column(Integer)      # Unix epoch seconds
+    end_time = Column(Integer)
     additional_info = Column(Text, nullable=True)
     location = Column(String)
 
     # One-to-many via students.appointment_id
     attendees = relationship("Student", back_populates="appointment", foreign_keys="Student.appointment_id")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "creator_student_id": self.creator_student_id,
-            "course_id": self.course_id,
-            "start_time": self.start_time,
-            "end_time": self.end_time,
-            "additional_info": self.additional_info,
-            "location": self.location,
-            "attendees": [x.id for x in self.attendees],
-        }
-
     # Convenience relationships
     creator = relationship("Student", foreign_keys=[creator_student_id])
     course = relationship("Course")
 
+# --- Serializer views ---
+# Column projections for the read paths in db_utils. A view selects exactly the
+# columns it returns, so serializing never lazy-loads a relationship; "detail"
+# reads add related ids (a course's students, a student's courses, an
+# appointment's attendees) with one batched query instead.
+COURSE_SUMMARY = (Course.id, Course.code, Course.name)
+STUDENT_PUBLIC = (Student.id, Student.name)
+STUDENT_DETAIL = (Student.id, Student.name, Student.email, Student.appointment_id)
+APPOINTMENT_SUMMARY = (
+    Appointment.id,
+    Appointment.creator_student_id,
+    Appointment.course_id,
+    Appointment.start_time,
+    Appointment.end_time,
+    Appointment.additional_info,
+    Appointment.location,
+)
+
+# Row shapes the read paths return (plain dicts, so they serialize without
+# conversion and carry straight into events and caches).
+class CourseSummary(TypedDict):
+    id: int
+    code: str
+    name: str
+
+class StudentDetail(TypedDict):
+    id: int
+    name: str
+    email: str
+    appointment_id: Optional[int]
+    courses: list[int]
+
+class AppointmentSummary(TypedDict):
+    id: int
+    creator_student_id: Optional[int]
+    course_id: Optional[int]
+    start_time: int
+    end_time: int
+    additional_info: Optional[str]
+    location: str
+    attendees: list[int]
+
+class FeedEntry(TypedDict):
+    id: int
+    course_id: int
+    creator_student_id: Optional[int]
+    start_time: int
+    end_time: int
+    location: str
+    additional_info: Optional[str]
+    course_code: str
+    course_name: str
+    creator_name: Optional[str]
+    attendee_count: int
+
+class StudyPartner(TypedDict):
+    id: int
+    name: str
+    shared_courses: list[int]
+    appointment_id: Optional[int]
+    hosting: bool
+
 from passlib.context import CryptContext
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
-def build_and_seed(db_path: Path = DB_FILE):
-    if db_path.exists():
+def build_and_seed(db_path: Path = DB_FILE, fresh: bool = False):
+    """Bring the database up to the current schema in place. fresh=True deletes it first."""
+    import migrations
+
+    if fresh and db_path.exists():
         db_path.unlink()
 
     engine = create_engine(f"sqlite:///{db_path}", echo=False, future=True)
-    Base.metadata.create_all(engine)
+    migrations.upgrade(engine)
 
     # Seed with your mock example
     # with Session(engine) as session:
@@ -126,4 +184,5 @@ def build_and_seed(db_path: Path = DB_FILE):
     print(f"Created {db_path.resolve()}")
 
 if __name__ == "__main__":
-    build_and_seed()
+    import sys
+    build_and_seed(fresh="--fresh" in sys.argv)
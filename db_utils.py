@@ -1,28 +1,76 @@
 
 from contextlib import contextmanager
+from datetime import datetime
 from typing import Iterable, Sequence, Optional
-from sqlalchemy import create_engine, select
+from sqlalchemy import create_engine, select, insert, update, delete, func, literal, tuple_, or_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from db_spec import Student, Course, Appointment
-from engine import get_engine
+from db_spec import (
+    Student, Course, Appointment, student_courses,
+    COURSE_SUMMARY, STUDENT_PUBLIC, STUDENT_DETAIL, APPOINTMENT_SUMMARY,
+    CourseSummary, StudentDetail, AppointmentSummary, FeedEntry, StudyPartner,
+)
+from engine import get_engine, get_read_engine
+import events
+import changes
 
-engine = get_engine()
+# None: use the engines start_engine() made; migrations.explain overrides them
+engine = None
+read_engine = None
 
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+_CHANGES = "changes"
 
 @contextmanager
-def session_scope():
-    """Transactional scope."""
-    with Session(engine) as s:
+def session_scope(session: Optional[Session] = None, readonly: bool = False):
+    """
+    Transactional scope. Given a session (the request's unit of work), join it
+    and leave commit/rollback to its owner; otherwise open, commit and close one,
+    on the read engine if `readonly`.
+    """
+    if session is not None:
+        yield session
+        return
+    with new_session(readonly) as s:
         try:
             yield s
-            s.commit()
+            commit(s)
         except:
-            s.rollback()
+            rollback(s)
             raise
 
+def new_session(readonly: bool = False) -> Session:
+    """
+    A session for a caller-managed unit of work; finish it with commit() or
+    rollback(). A readonly session reads through the read engine and can't write.
+    """
+    if readonly:
+        return Session(read_engine or get_read_engine())
+    return Session(engine or get_engine())
+
+def commit(s: Session) -> None:
+    """
+    Commit, then apply the changes queued with _changed (cache bumps, live
+    events). Errors in those are logged by changes.apply, not raised.
+    """
+    changed = s.info.pop(_CHANGES, [])
+    if not changed:
+        s.commit()
+        return
+    change_id = changes.record(s, changed)
+    s.commit()
+    changes.apply(changed, change_id)
+
+def rollback(s: Session) -> None:
+    s.rollback()
+    s.info.pop(_CHANGES, None)
+
+def _changed(s: Session, kind: str, *args, **kwargs) -> None:
+    """
+    Queue a change (see changes.py) to apply once the current transaction has
+    committed, here and in every other process. Arguments must be JSON.
+    """
+    s.info.setdefault(_CHANGES, []).append([kind, args, kwargs])
+
 # --- Helpers ---
 def _get_student(s: Session, student_id: int) -> Student:
     st = s.get(Student, student_id)
@@ -42,240 +90,589 @@ def _get_appointment(s: Session, appt_id: int) -> Appointment:
         raise ValueError(f"Appointment {appt_id} not found.")
     return a
 
+def _appointment_course(s: Session, appt_id: int) -> int | None:
+    row = s.execute(select(Appointment.course_id).where(Appointment.id == appt_id)).first()
+    if row is None:
+        raise ValueError(f"Appointment {appt_id} not found.")
+    return row.course_id
+
+# --- Views ---
+def _view(s: Session, columns, *where, order_by=()) -> list[dict]:
+    """Select just `columns` (a db_spec view) and return the rows as dicts."""
+    stmt = select(*columns).where(*where).order_by(*order_by)
+    return [dict(row) for row in s.execute(stmt).mappings()]
+
+def _one(rows: list[dict], kind: str, key: int) -> dict:
+    if not rows:
+        raise ValueError(f"{kind} {key} not found.")
+    return rows[0]
+
+def _ids_by(s: Session, key_col, value_col, keys) -> dict[int, list[int]]:
+    """Group value_col by key_col for the given keys, in one query."""
+    grouped = {k: [] for k in keys}
+    if grouped:
+        stmt = select(key_col, value_col).where(key_col.in_(grouped)).order_by(key_col, value_col)
+        for k, v in s.execute(stmt):
+            grouped[k].append(v)
+    return grouped
+
+def _with_students(s: Session, courses: list[dict]) -> list[dict]:
+    ids = _ids_by(s, student_courses.c.course_id, student_courses.c.student_id, [c["id"] for c in courses])
+    for c in courses:
+        c["students"] = ids[c["id"]]
+    return courses
+
+def _with_courses(s: Session, students: list[dict]) -> list[dict]:
+    ids = _ids_by(s, student_courses.c.student_id, student_courses.c.course_id, [st["id"] for st in students])
+    for st in students:
+        st["courses"] = ids[st["id"]]
+    return students
+
+def _with_attendees(s: Session, appts: list[dict]) -> list[dict]:
+    ids = _ids_by(s, Student.appointment_id, Student.id, [a["id"] for a in appts])
+    for a in appts:
+        a["attendees"] = ids[a["id"]]
+    return appts
+
+def _publish_appointment(kind: str, appointment_id: int, course_id: int | None, **extra) -> None:
+    """Push an appointment delta to live feed streams. Call only after the change committed."""
+    if not events.has_subscribers(course_id):
+        return
+    event = {"type": kind, "course_id": course_id, "appointment_id": appointment_id, **extra}
+    if kind != "ended":
+        event["appointment"] = get_feed_entry(appointment_id)
+    events.publish(course_id, event)
+
+changes.register("appointment", _publish_appointment)
+
 # --- Utilities ---
-def get_appointment_dict(appt_id: int) -> dict:
-    with session_scope() as s:
-        a = _get_appointment(s, appt_id)
-        return a.to_dict()
+def get_appointment_dict(appt_id: int, session: Optional[Session] = None) -> dict:
+    with session_scope(session) as s:
+        rows = _view(s, APPOINTMENT_SUMMARY, Appointment.id == appt_id)
+        return _with_attendees(s, [_one(rows, "Appointment", appt_id)])[0]
     
-def get_student_appointment(student_id: int) -> dict | None:
-    with session_scope() as s:
+def get_student_appointment(student_id: int, session: Optional[Session] = None) -> dict | None:
+    with session_scope(session) as s:
         
-        appt_id = get_student_dict(student_id)["appointment_id"]
+        appt_id = get_student_dict(student_id, session=s)["appointment_id"]
+        if appt_id is None:
+            return None
         try:
-            appt_dict = get_appointment_dict(appt_id)
-        except:
+            return get_appointment_dict(appt_id, session=s)
+        except ValueError:
+            # Dangling reference to an appointment that no longer exists
             _get_student(s, student_id).appointment_id = None
+            _changed(s, "students", [student_id])
             return None
 
-        return appt_dict
+def get_student_dict(student_id: int, session: Optional[Session] = None) -> dict:
+    with session_scope(session) as s:
+        rows = _view(s, STUDENT_DETAIL, Student.id == student_id)
+        return _with_courses(s, [_one(rows, "Student", student_id)])[0]
 
-def get_student_dict(student_id: int) -> dict:
-    with session_scope() as s:
-        st = _get_student(s, student_id)
-        return st.to_dict()
-
-def get_course_dict(course_id: int) -> dict:
-    with session_scope() as s:
-        c = _get_course(s, course_id)
-        return c.to_dict()
+def get_course_dict(course_id: int, session: Optional[Session] = None) -> dict:
+    with session_scope(session) as s:
+        rows = _view(s, COURSE_SUMMARY, Course.id == course_id)
+        return _with_students(s, [_one(rows, "Course", course_id)])[0]
 
-def create_student(name: str, email: str, password: str) -> int:
-    """Create a Student (name, email). Returns student id."""
-    with session_scope() as s:
+def create_student(name: str, email: str, hashed_password: str, session: Optional[Session] = None) -> int:
+    """Create a Student (name, email). Hash the password with passwords.hash_password first. Returns student id."""
+    with session_scope(session) as s:
         st = Student(name=name.strip(), 
                      email=email.strip(),
-                     hashed_password=pwd_context.hash(password))
+                     hashed_password=hashed_password)
         s.add(st)
         s.flush()
         return st.id 
 
-def create_course(code: str, name: str, instructor: Optional[str] = None) -> int:
+def set_password_hash(student_id: int, hashed_password: str, session: Optional[Session] = None) -> None:
+    """Replace the student's stored password hash (e.g. re-hash after Argon2 parameters changed)."""
+    with session_scope(session) as s:
+        s.execute(update(Student).where(Student.id == student_id).values(hashed_password=hashed_password))
+        _changed(s, "students", [student_id])
+
+def create_course(code: str, name: str, session: Optional[Session] = None) -> int:
     """Create a Course. Returns course id."""
-    with session_scope() as s:
-        c = Course(code=code.strip(), name=name.strip(), instructor=(instructor or None))
+    with session_scope(session) as s:
+        c = Course(code=code.strip(), name=name.strip())
         s.add(c)
         s.flush()
+        _changed(s, "catalog")
         return c.id
 
-def set_courses_for_student(student_id: int, course_ids: Sequence[int]) -> None:
+def _course_ids_of(s: Session, student_id: int) -> set[int]:
+    return set(s.scalars(
+        select(student_courses.c.course_id).where(student_courses.c.student_id == student_id)
+    ))
+
+def _enroll(s: Session, student_id: int, course_ids: Iterable[int]) -> list[int]:
+    """INSERT OR IGNORE the (student, course) pairs for courses that exist. Returns the newly added course ids."""
+    return s.scalars(
+        insert(student_courses)
+        .prefix_with("OR IGNORE")
+        .from_select(
+            ["student_id", "course_id"],
+            select(literal(student_id), Course.id).where(Course.id.in_(list(course_ids))),
+        )
+        .returning(student_courses.c.course_id)
+    ).all()
+
+def _enrollment_changed(s: Session, student_id: int, changed: Iterable[int]) -> None:
+    _changed(s, "courses", list(changed))
+    _changed(s, "students", [student_id])
+    _changed(s, "enrollment", student_id, sorted(_course_ids_of(s, student_id)))
+
+def set_courses_for_student(student_id: int, course_ids: Sequence[int], session: Optional[Session] = None) -> None:
     """
     Set the student's enrolled courses to exactly 'course_ids'
     (adds missing, removes extras).
     """
-    with session_scope() as s:
-        st = _get_student(s, student_id)
-        # Load current set
-        current_ids = {c.id for c in st.courses}
-        target_ids = set(course_ids)
-
-        # Remove extras
-        for c in list(st.courses):
-            if c.id not in target_ids:
-                st.courses.remove(c)
-
-        # Add missing
-        missing = target_ids - current_ids
-        if missing:
-            to_add = s.scalars(select(Course).where(Course.id.in_(missing))).all()
-            if len(to_add) != len(missing):
-                found = {c.id for c in to_add}
-                missing_report = sorted(missing - found)
-                raise ValueError(f"Courses not found: {missing_report}")
-            st.courses.extend(to_add)
+    target_ids = set(course_ids)
+    with session_scope(session) as s:
+        _get_student(s, student_id)
+        found = set(s.scalars(select(Course.id).where(Course.id.in_(target_ids))))
+        if found != target_ids:
+            raise ValueError(f"Courses not found: {sorted(target_ids - found)}")
+
+        removed = s.scalars(
+            delete(student_courses)
+            .where(student_courses.c.student_id == student_id)
+            .where(student_courses.c.course_id.not_in(target_ids))
+            .returning(student_courses.c.course_id)
+        ).all()
+        added = _enroll(s, student_id, target_ids)
+
+        if removed or added:
+            _enrollment_changed(s, student_id, [*removed, *added])
+
+def add_course_for_student(student_id: int, course_id: int, session: Optional[Session] = None) -> bool:
+    """Enroll the student in one course. Returns False if they were already enrolled."""
+    with session_scope(session) as s:
+        if _enroll(s, student_id, [course_id]):
+            _enrollment_changed(s, student_id, [course_id])
+            return True
+        _get_course(s, course_id)
+        return False
+
+def remove_course_for_student(student_id: int, course_id: int, session: Optional[Session] = None) -> bool:
+    """Drop one course. Returns False if the student wasn't enrolled in it."""
+    with session_scope(session) as s:
+        result = s.execute(
+            delete(student_courses)
+            .where(student_courses.c.student_id == student_id)
+            .where(student_courses.c.course_id == course_id)
+        )
+        if not result.rowcount:
+            return False
+        _enrollment_changed(s, student_id, [course_id])
+        return True
+
+def _attend(s: Session, student_id: int, appointment_id: int) -> bool:
+    """
+    Point the student at the appointment unless they already attend a different
+    one. A single conditional UPDATE, so two concurrent joins can't both win.
+    """
+    result = s.execute(
+        update(Student)
+        .where(Student.id == student_id)
+        .where(or_(Student.appointment_id.is_(None), Student.appointment_id == appointment_id))
+        .values(appointment_id=appointment_id)
+    )
+    return result.rowcount == 1
 
 def create_appointment(
     creator_student_id: int,
     course_id: int,
-    start_time: str,
-    end_time: str,
+    start_time: int,
+    end_time: int,
     location: str,
     additional_info: Optional[str],
+    session: Optional[Session] = None,
 ) -> int:
     """
-    Create an appointment. Optionally adds the creator as attendee
+    Create an appointment and make the creator its first attendee
     (enforces one-appointment-per-student).
     Returns appointment id.
     """
-    with session_scope() as s:
-        
-        creator = _get_student(s, creator_student_id)
-        course = _get_course(s, course_id) if course_id is not None else None
-
-        appt = Appointment(
-            creator_student_id=creator.id,
-            course=course,
-            start_time=start_time,
-            end_time=end_time,
-            location=location,
-            additional_info=additional_info,
+    with session_scope(session) as s:
+        if course_id is not None:
+            _get_course(s, course_id)
+
+        appt_id = s.scalar(
+            insert(Appointment)
+            .values(
+                creator_student_id=creator_student_id,
+                course_id=course_id,
+                start_time=start_time,
+                end_time=end_time,
+                location=location,
+                additional_info=additional_info,
+            )
+            .returning(Appointment.id)
         )
-        s.add(appt)     
-        s.flush()  # assign appt.id
-
-        if creator.appointment_id and creator.appointment_id != appt.id:
-            # print('FUCL')
-            raise ValueError(f"Student {creator.id} already attends appointment {creator.appointment_id}.")
-        creator.appointment_id = appt.id
-
-        return appt.id
-
-def add_attendee_to_appointment(appointment_id: int, student_id: int) -> None:
-    """Assign the student to attend the given appointment. Enforces at most one appointment per student."""
-    with session_scope() as s:
-        appt = _get_course(s, appointment_id)
-        st = _get_student(s, student_id)
+        if not _attend(s, creator_student_id, appt_id):
+            _get_student(s, creator_student_id)
+            raise ValueError(f"Student {creator_student_id} already attends another appointment.")
 
-        if st.appointment_id and st.appointment_id != appt.id:
-            raise ValueError(f"Student {student_id} already attends appointment {st.appointment_id}.")
-        st.appointment_id = appt.id  # links via FK
+        _changed(s, "courses", [course_id])
+        _changed(s, "students", [creator_student_id])
+        _changed(s, "appointment", "created", appt_id, course_id)
+        _changed(s, "scheduled", appt_id, course_id, start_time, end_time)
+        return appt_id
 
-def remove_attendee_from_appointment(appointment_id: int, student_id: int) -> None:
+def add_attendee_to_appointment(appointment_id: int, student_id: int, session: Optional[Session] = None) -> None:
     """Assign the student to attend the given appointment. Enforces at most one appointment per student."""
-    with session_scope() as s:
-        appt = _get_course(s, appointment_id)
-        st = _get_student(s, student_id)
-
-        if st.appointment_id and st.appointment_id != appt.id:
-            raise ValueError(f"Student {student_id} doesn't seem to be attending {st.appointment_id}.")
-        st.appointment_id = None  # links via FK
+    with session_scope(session) as s:
+        course_id = _appointment_course(s, appointment_id)
+        if not _attend(s, student_id, appointment_id):
+            _get_student(s, student_id)
+            raise ValueError(f"Student {student_id} already attends another appointment.")
+
+        _changed(s, "courses", [course_id])
+        _changed(s, "students", [student_id])
+        _changed(s, "appointment", "joined", appointment_id, course_id, student_id=student_id)
+
+def remove_attendee_from_appointment(appointment_id: int, student_id: int, session: Optional[Session] = None) -> None:
+    """Detach the student from the given appointment. A no-op if they weren't attending anything."""
+    with session_scope(session) as s:
+        course_id = _appointment_course(s, appointment_id)
+        result = s.execute(
+            update(Student)
+            .where(Student.id == student_id)
+            .where(Student.appointment_id == appointment_id)
+            .values(appointment_id=None)
+            )
+        if not result.rowcount:
+            other = _get_student(s, student_id).appointment_id
+            if other is not None:
+                raise ValueError(f"Student {student_id} doesn't seem to be attending {appointment_id}.")
+            return
+
+        _changed(s, "courses", [course_id])
+        _changed(s, "students", [student_id])
+        _changed(s, "appointment", "left", appointment_id, course_id, student_id=student_id)
 
 def edit_appointment(
     appointment_id: int,     
-    start_time: str,
-    end_time: str,
+    start_time: int,
+    end_time: int,
     location: str,
     additional_info: Optional[str],
+    session: Optional[Session] = None,
 ) -> None:
-    """Set a later end_time for the appointment."""
-    with session_scope() as s:
-        appt = _get_appointment(s, appointment_id)
-        appt.start_time = start_time
-        appt.end_time = end_time
-        appt.additional_info = additional_info
-        appt.location = location
-
-def end_appointment(appointment_id: int) -> None:
+    """Replace the appointment's time, place and notes."""
+    with session_scope(session) as s:
+        row = s.execute(
+            update(Appointment)
+            .where(Appointment.id == appointment_id)
+            .values(
+                start_time=start_time,
+                end_time=end_time,
+                location=location,
+                additional_info=additional_info,
+            )
+            .returning(Appointment.course_id)
+            ).first()
+        if row is None:
+            raise ValueError(f"Appointment {appointment_id} not found.")
+
+        _changed(s, "courses", [row.course_id])
+        _changed(s, "appointment", "edited", appointment_id, row.course_id)
+        _changed(s, "scheduled", appointment_id, row.course_id, start_time, end_time)
+
+def end_appointment(appointment_id: int, session: Optional[Session] = None) -> None:
     """
     End the appointment early by deleting it.
     All attending students are detached (appointment_id = NULL) before deletion.
     """
+    with session_scope(session) as s:
+        rows, attendee_ids = _delete_appointments(s, Appointment.id == appointment_id)
+        if not rows:
+            raise ValueError(f"Appointment {appointment_id} not found.")
+        _deleted(s, rows, attendee_ids)
+
+# --- Background maintenance ---
+
+def _delete_appointments(s: Session, condition) -> tuple[list, list[int]]:
+    """
+    Detach every attendee of the appointments matching `condition`, then delete them.
+    Returns the (id, course_id) row of each deleted appointment and the detached student ids.
+    """
+    rows = s.execute(select(Appointment.id, Appointment.course_id).where(condition)).all()
+    appt_ids = [r.id for r in rows]
+    if not appt_ids:
+        return rows, []
+    attendee_ids = s.scalars(
+        update(Student)
+        .where(Student.appointment_id.in_(appt_ids))
+        .values(appointment_id=None)
+        .returning(Student.id)
+    ).all()
+    s.execute(delete(Appointment).where(Appointment.id.in_(appt_ids)))
+    return rows, attendee_ids
+
+def _deleted(s: Session, rows, attendee_ids) -> None:
+    if not rows:
+        return
+    _changed(s, "courses", [r.course_id for r in rows])
+    _changed(s, "students", list(attendee_ids))
+    for r in rows:
+        _changed(s, "appointment", "ended", r.id, r.course_id)
+    _changed(s, "unscheduled", [r.id for r in rows])
+
+def clear_hanging_appointments() -> int:
+    """
+    Delete appointments whose creator no longer points at them
+    (creator gone, or creator moved on to another appointment).
+    """
+    creator_attends = (
+        select(Student.id)
+        .where(Student.id == Appointment.creator_student_id)
+        .where(Student.appointment_id == Appointment.id)
+        .exists()
+    )
     with session_scope() as s:
-        appt = _get_appointment(s, appointment_id)
-    
-        # Detach attendees for safety (ORM-level), regardless of ON DELETE SET NULL
-        for st in list(appt.attendees):
-            print(st)
-            st.appointment_id = None
+        rows, attendee_ids = _delete_appointments(s, ~creator_attends)
+        _deleted(s, rows, attendee_ids)
+
+    return len(rows)
+
+def clear_expired_appointments(now: Optional[datetime] = None) -> int:
+    """Delete appointments whose end_time has passed."""
+    now = now or datetime.now()
+    expired = Appointment.end_time < int(now.timestamp())
+    with session_scope() as s:
+        rows, attendee_ids = _delete_appointments(s, expired)
+        _deleted(s, rows, attendee_ids)
 
-        s.delete(appt)
-        # commit handled by context manager
-# --- Additional read utilities ---
+    return len(rows)
 
-def clear_hanging_appointments():
+def prune_change_log() -> int:
+    """Delete change_log rows every running process has had time to replay."""
     with session_scope() as s:
-        # appt = _get_appointment(s, aid)
-        appts = s.query(Appointment).all()
-        for appt in appts:
-            creator = _get_student(s, appt.creator.id)
+        return changes.prune(s)
 
-            if creator.appointment_id != appt.id:
-                s.delete(appt)
+def reap_appointments(now: Optional[datetime] = None) -> int:
+    """Run every cleanup pass. Meant for the background reaper, never a request handler."""
+    return clear_hanging_appointments() + clear_expired_appointments(now)
 
 from sqlalchemy import select, func
 
-def get_appointments_for_course(course_id: int) -> list[dict]:
+def _in_window(stmt, since: Optional[int], until: Optional[int], after: Optional[tuple[int, int]], limit: Optional[int]):
     """
-    Return appointments linked to any course in course_ids.
+    Keep appointments still running at `since` and starting before `until`
+    (epoch seconds), ordered by (start_time, id) and resumed after the keyset
+    `after` = (start_time, id) of the previous page's last row.
+    """
+    if since is not None:
+        stmt = stmt.where(Appointment.end_time >= since)
+    if until is not None:
+        stmt = stmt.where(Appointment.start_time < until)
+    if after is not None:
+        stmt = stmt.where(tuple_(Appointment.start_time, Appointment.id) > tuple_(*after))
+    stmt = stmt.order_by(Appointment.start_time, Appointment.id)
+    return stmt.limit(limit) if limit is not None else stmt
+
+def get_appointments_for_course(
+    course_id: int,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    after: Optional[tuple[int, int]] = None,
+    limit: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> list[AppointmentSummary]:
+    """
+    Return one page of the course's appointments in the given time window (see _in_window).
     [
-      {id, course_id, creator_student_id, start_time, end_time, location, additional_info}
+      {id, course_id, creator_student_id, start_time, end_time, location, additional_info, attendees}
     ]
     """
-    with session_scope() as s:
+    with session_scope(session) as s:
+        stmt = select(*APPOINTMENT_SUMMARY).where(Appointment.course_id == course_id)
+        rows = [dict(row) for row in s.execute(_in_window(stmt, since, until, after, limit)).mappings()]
+        return _with_attendees(s, rows)
+
+
+def _feed_select():
+    """Appointments joined with the course and creator data the feed renders."""
+    attendee_count = (
+        select(func.count(Student.id))
+        .where(Student.appointment_id == Appointment.id)
+        .correlate(Appointment)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Appointment.id,
+            Appointment.course_id,
+            Appointment.creator_student_id,
+            Appointment.start_time,
+            Appointment.end_time,
+            Appointment.location,
+            Appointment.additional_info,
+            Course.code.label("course_code"),
+            Course.name.label("course_name"),
+            Student.name.label("creator_name"),
+            attendee_count.label("attendee_count"),
+        )
+        .join(Course, Course.id == Appointment.course_id)
+        .outerjoin(Student, Student.id == Appointment.creator_student_id)
+    )
+
+def get_feed_for_student(
+    student_id: int,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    after: Optional[tuple[int, int]] = None,
+    limit: Optional[int] = None,
+    session: Optional[Session] = None,
+) -> list[FeedEntry]:
+    """
+    Return one page of appointments in the student's courses, in the given
+    time window (see _in_window), with the course and creator data the feed
+    needs embedded, in a single joined query.
+    [
+      {id, course_id, creator_student_id, start_time, end_time, location, additional_info,
+       course_code, course_name, creator_name, attendee_count}
+    ]
+    """
+    with session_scope(session) as s:
         stmt = (
-            select(Appointment)
-            .where(Appointment.course_id == course_id)
-            .order_by(Appointment.start_time)
+            _feed_select()
+            .join(student_courses, student_courses.c.course_id == Appointment.course_id)
+            .where(student_courses.c.student_id == student_id)
         )
-        rows = s.scalars(stmt).all()
-        return [a.to_dict() for a in rows]
-    
+        return [dict(row) for row in s.execute(_in_window(stmt, since, until, after, limit)).mappings()]
 
-def get_courses_for_student(student_id: int) -> list[dict]:
+def get_feed_entries(appointment_ids: Sequence[int], session: Optional[Session] = None) -> list[FeedEntry]:
+    """Appointments in the same shape as get_feed_for_student, ordered by (start_time, id)."""
+    with session_scope(session) as s:
+        stmt = (
+            _feed_select()
+            .where(Appointment.id.in_(set(appointment_ids)))
+            .order_by(Appointment.start_time, Appointment.id)
+        )
+        return [dict(row) for row in s.execute(stmt).mappings()]
+
+def get_feed_entry(appointment_id: int, session: Optional[Session] = None) -> FeedEntry | None:
+    """Return one appointment in the same shape as get_feed_for_student, or None."""
+    with session_scope(session) as s:
+        row = s.execute(_feed_select().where(Appointment.id == appointment_id)).mappings().first()
+        return dict(row) if row else None
+
+def get_courses_for_student(student_id: int, session: Optional[Session] = None) -> list[CourseSummary]:
     """
-    Return all courses a student is enrolled in.
+    Return all courses a student is enrolled in, as {id, code, name}.
     """
-    with session_scope() as s:
-        st = _get_student(s, student_id)
-        # Ensure collection is loaded in-session
-        return [c.to_dict() for c in st.courses]
+    with session_scope(session) as s:
+        stmt = (
+            select(*COURSE_SUMMARY)
+            .join(student_courses, student_courses.c.course_id == Course.id)
+            .where(student_courses.c.student_id == student_id)
+            .order_by(Course.id)
+        )
+        return [dict(row) for row in s.execute(stmt).mappings()]
 
-def get_attending_students(appointment_id: int) -> list[dict]:
+def get_attending_students(appointment_id: int, session: Optional[Session] = None) -> list[dict]:
     """
-    Return all students attending an appointment.
+    Return all students attending an appointment, as {id, name}.
     """
-    with session_scope() as s:
-        appt = _get_appointment(s, appointment_id)
-        # appt.attendees is the ORM one-to-many via Student.appointment_id
-        return [st.to_dict() for st in appt.attendees]
+    with session_scope(session) as s:
+        _one(_view(s, (Appointment.id,), Appointment.id == appointment_id), "Appointment", appointment_id)
+        return _view(s, STUDENT_PUBLIC, Student.appointment_id == appointment_id, order_by=(Student.id,))
     
-def get_creator(appointment_id: int) -> list[dict]:
+def get_creator(appointment_id: int, session: Optional[Session] = None) -> dict | None:
     """
-    Return the creator of an appointment.
+    Return the creator of an appointment, as {id, name}.
     """
-    with session_scope() as s:
-        appt = _get_appointment(s, appointment_id)
-        return appt.creator.to_dict()
-
-def get_student_from_email(email_to_search: str):
-    with session_scope() as s:
-        st = s.query(Student).filter(Student.email == email_to_search).first()
-
-        if st is None: return None
-
-        dct = st.to_dict()
-        return dct
+    with session_scope(session) as s:
+        stmt = (
+            select(Appointment.creator_student_id, *STUDENT_PUBLIC)
+            .outerjoin(Student, Student.id == Appointment.creator_student_id)
+            .where(Appointment.id == appointment_id)
+        )
+        row = s.execute(stmt).first()
+        if row is None:
+            raise ValueError(f"Appointment {appointment_id} not found.")
+        return {"id": row.id, "name": row.name} if row.id is not None else None
+
+# --- Batch lookups: one IN (...) query per table, ids that don't exist are skipped ---
+def get_courses_by_ids(course_ids: Sequence[int], session: Optional[Session] = None) -> list[dict]:
+    """Courses as {id, code, name}, ordered by id."""
+    with session_scope(session) as s:
+        return _view(s, COURSE_SUMMARY, Course.id.in_(set(course_ids)), order_by=(Course.id,))
+
+def get_appointments_by_ids(appointment_ids: Sequence[int], session: Optional[Session] = None) -> list[dict]:
+    """Appointments in the same shape as get_appointment_dict, ordered by id."""
+    with session_scope(session) as s:
+        rows = _view(s, APPOINTMENT_SUMMARY, Appointment.id.in_(set(appointment_ids)), order_by=(Appointment.id,))
+        return _with_attendees(s, rows)
+
+def get_public_students(student_ids: Sequence[int], session: Optional[Session] = None) -> list[dict]:
+    """Students as {id, name}, ordered by id."""
+    with session_scope(session) as s:
+        return _view(s, STUDENT_PUBLIC, Student.id.in_(set(student_ids)), order_by=(Student.id,))
+
+def get_enrollments(session: Optional[Session] = None) -> list[tuple[int, int]]:
+    """Every (student_id, course_id) pair; the classmates index is built from these."""
+    with session_scope(session, readonly=True) as s:
+        return [tuple(row) for row in s.execute(select(student_courses.c.student_id, student_courses.c.course_id))]
+
+def get_appointment_times(session: Optional[Session] = None) -> list[tuple[int, int | None, int, int]]:
+    """Every appointment as (id, course_id, start_time, end_time); the schedule index is built from these."""
+    with session_scope(session, readonly=True) as s:
+        stmt = select(Appointment.id, Appointment.course_id, Appointment.start_time, Appointment.end_time)
+        return [tuple(row) for row in s.execute(stmt)]
+
+def get_study_partners(ranked: Sequence[tuple[int, list[int]]], session: Optional[Session] = None) -> list[StudyPartner]:
+    """
+    Hydrate classmates.recommend() output, keeping its order: names, plus the
+    appointment each one attends and whether they host it. Two IN (...) lookups.
+    """
+    with session_scope(session) as s:
+        students = {
+            row.id: row
+            for row in s.execute(
+                select(Student.id, Student.name, Student.appointment_id)
+                .where(Student.id.in_([sid for sid, _ in ranked]))
+            )
+        }
+        appt_ids = {row.appointment_id for row in students.values() if row.appointment_id is not None}
+        creators = dict(s.execute(
+            select(Appointment.id, Appointment.creator_student_id).where(Appointment.id.in_(appt_ids))
+        ).all()) if appt_ids else {}
+        partners = []
+        for sid, shared in ranked:
+            row = students.get(sid)
+            if row is None:
+                continue  # deleted since the index last heard of them
+            partners.append({
+                "id": sid,
+                "name": row.name,
+                "shared_courses": shared,
+                "appointment_id": row.appointment_id,
+                "hosting": creators.get(row.appointment_id) == sid,
+            })
+        return partners
+
+def get_student_from_email(email_to_search: str, session: Optional[Session] = None):
+    """Return the student's detail view plus hashed_password, for authentication."""
+    with session_scope(session, readonly=True) as s:
+        rows = _view(s, (*STUDENT_DETAIL, Student.hashed_password), Student.email == email_to_search)
+        if not rows: return None
+        return _with_courses(s, rows[:1])[0]
     
 
 # DEBUG ONLY
-def get_all_students():
-    with session_scope() as s:
-        return [stud.to_dict() for stud in s.query(Student).all()]
+def get_all_students(session: Optional[Session] = None) -> list[StudentDetail]:
+    with session_scope(session) as s:
+        return _with_courses(s, _view(s, STUDENT_DETAIL, order_by=(Student.id,)))
 
-def get_all_appointments():
-    with session_scope() as s:
-        return [appt.to_dict() for appt in s.query(Appointment).all()]
+def get_all_appointments(session: Optional[Session] = None) -> list[AppointmentSummary]:
+    with session_scope(session) as s:
+        return _with_attendees(s, _view(s, APPOINTMENT_SUMMARY, order_by=(Appointment.id,)))
     
-def get_all_courses():
-    with session_scope() as s:
-        return [course.to_dict() for course in s.query(Course).all()]
+def get_all_courses(session: Optional[Session] = None) -> list[CourseSummary]:
+    """Every course as {id, code, name}; no enrollment data."""
+    with session_scope(session, readonly=True) as s:
+        return _view(s, COURSE_SUMMARY, order_by=(Course.id,))
@@ -1,15 +1,156 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import functools
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event
+
+import metrics
 
 _engine = None
+_read_engine = None
+_db_executor = None
+
+# --- Database URLs ---
+# The one place that says where the data lives. Writes and migrations go to
+# DATABASE_URL. GET requests and other pure reads go to DATABASE_READ_URL, which
+# defaults to the same database opened with query_only connections. Pointing it
+# at a replica moves reads off the primary; caches built from the replica then
+# lag by its replication delay.
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///main.db")
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL", DATABASE_URL)
+
+# Threads dedicated to database work; bounds how many queries run at once
+DB_EXECUTOR_THREADS = int(os.environ.get("DB_EXECUTOR_THREADS", "8"))
+
+# --- SQLite profile ---
+# Applied to every new connection; override any of them through the environment
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", "-32000")),  # negative = KiB
+    "temp_store": os.environ.get("DB_TEMP_STORE", "MEMORY"),
+}
+
+# Reader pool; by default one connection per DB executor thread, plus a little headroom
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", str(DB_EXECUTOR_THREADS)))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "4"))
+# Writer pool; SQLite commits one transaction at a time, so more writers only wait on its lock
+DB_WRITER_POOL_SIZE = int(os.environ.get("DB_WRITER_POOL_SIZE", "2"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+def _apply_pragmas(dbapi_conn, connection_record):
+    cur = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+def _apply_read_pragmas(dbapi_conn, connection_record):
+    _apply_pragmas(dbapi_conn, connection_record)
+    dbapi_conn.execute("PRAGMA query_only=1")
+    # pysqlite only opens a transaction before writes; _begin_read opens ours
+    dbapi_conn.isolation_level = None
+
+def _begin_read(conn):
+    # So every read in a session sees one snapshot, taken at its first SELECT
+    conn.exec_driver_sql("BEGIN")
+
+def _report_profile(engine, read_engine):
+    with engine.connect() as conn:
+        active = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in SQLITE_PRAGMAS}
+    active = ", ".join(f"{k}={v}" for k, v in active.items())
+    print(f"SQLite profile: {active}; writer pool_size={DB_WRITER_POOL_SIZE}, "
+          f"reader pool_size={DB_POOL_SIZE}, max_overflow={DB_MAX_OVERFLOW}")
+    if read_engine.url != engine.url:
+        print(f"Reads go to {read_engine.url.render_as_string(hide_password=True)}")
+
+# --- Query accounting ---
+# Statement count, time and fetched rows go to the current request's metrics
+class _CountingCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            metrics.record_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        metrics.record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        metrics.record_rows(len(rows))
+        return rows
+
+class _Connection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.record_query(statement, time.perf_counter() - context._query_started)
+
+def _create(url: str, pool_size: int, on_connect):
+    engine = create_engine(
+        url,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={"factory": _Connection},
+    )
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
 
 def start_engine():
     # --- Engine / Session ---
-    global _engine
-    _engine = create_engine(
-        "sqlite:///main.db",
-        future=True
-    )
+    global _engine, _read_engine
+    if _engine is not None:
+        return
+    _engine = _create(DATABASE_URL, DB_WRITER_POOL_SIZE, _apply_pragmas)
+    _read_engine = _create(DATABASE_READ_URL, DB_POOL_SIZE, _apply_read_pragmas)
+    event.listen(_read_engine, "begin", _begin_read)
+    _report_profile(_engine, _read_engine)
 
 def get_engine():
+    """The read-write engine."""
     global _engine
-    return _engine
\ No newline at end of file
+    return _engine
+
+def get_read_engine():
+    """The engine for pure reads; its connections refuse to write."""
+    global _read_engine
+    return _read_engine
+
+# --- DB executor ---
+def get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+    return _db_executor
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a synchronous db_utils call on the DB executor and await its result,
+    so blocking SQLite work never runs on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_db_executor(), call)
+
+def shutdown_db_executor():
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
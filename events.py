@@ -0,0 +1,93 @@
+import asyncio
+import json
+import threading
+from typing import Iterable
+
+# In-process event bus for live feed updates.
+# Each open /feed/stream connection is a Subscriber indexed by the courses its
+# student is enrolled in; db_utils publishes appointment deltas per course after
+# committing. Publishing is thread-safe: delivery is handed to the subscriber's
+# event loop, so mutators may run on the loop or in worker threads.
+
+QUEUE_SIZE = 100
+
+class Subscriber:
+    def __init__(self, student_id: int, course_ids: Iterable[int]):
+        self.student_id = student_id
+        self.course_ids = set(course_ids)
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.loop = asyncio.get_running_loop()
+
+_lock = threading.Lock()
+_by_course: dict[int, set[Subscriber]] = {}
+_by_student: dict[int, set[Subscriber]] = {}
+
+_RESYNC = json.dumps({"type": "resync"})
+
+def _deliver(sub: Subscriber, data: str):
+    try:
+        sub.queue.put_nowait(data)
+    except asyncio.QueueFull:
+        # Slow consumer: drop the backlog and have the client redraw from scratch
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(_RESYNC)
+
+def _send(subs: Iterable[Subscriber], data: str):
+    for sub in subs:
+        try:
+            sub.loop.call_soon_threadsafe(_deliver, sub, data)
+        except RuntimeError:
+            pass  # loop already closed; the subscriber is going away
+
+def subscribe(student_id: int, course_ids: Iterable[int]) -> Subscriber:
+    """Register a stream for `student_id`. Must be called from the loop that will consume it."""
+    sub = Subscriber(student_id, course_ids)
+    with _lock:
+        _by_student.setdefault(student_id, set()).add(sub)
+        for cid in sub.course_ids:
+            _by_course.setdefault(cid, set()).add(sub)
+    return sub
+
+def unsubscribe(sub: Subscriber):
+    with _lock:
+        _by_student.get(sub.student_id, set()).discard(sub)
+        if not _by_student.get(sub.student_id):
+            _by_student.pop(sub.student_id, None)
+        for cid in sub.course_ids:
+            _by_course.get(cid, set()).discard(sub)
+            if not _by_course.get(cid):
+                _by_course.pop(cid, None)
+
+def has_subscribers(course_id: int | None) -> bool:
+    return course_id in _by_course
+
+def publish(course_id: int | None, event: dict):
+    """Send `event` to every stream whose student is enrolled in `course_id`."""
+    with _lock:
+        subs = list(_by_course.get(course_id, ()))
+    if subs:
+        _send(subs, json.dumps(event))
+
+def set_student_courses(student_id: int, course_ids: Iterable[int]):
+    """Re-index the student's open streams after their enrollment changed, and ask them to resync."""
+    course_ids = set(course_ids)
+    with _lock:
+        subs = list(_by_student.get(student_id, ()))
+        for sub in subs:
+            for cid in sub.course_ids - course_ids:
+                _by_course.get(cid, set()).discard(sub)
+                if not _by_course.get(cid):
+                    _by_course.pop(cid, None)
+            for cid in course_ids - sub.course_ids:
+                _by_course.setdefault(cid, set()).add(sub)
+            sub.course_ids = set(course_ids)
+    if subs:
+        _send(subs, _RESYNC)
+
+def resync_all():
+    """Ask every open stream to redraw, e.g. after this process missed changes."""
+    with _lock:
+        subs = [sub for subs in _by_student.values() for sub in subs]
+    if subs:
+        _send(subs, _RESYNC)
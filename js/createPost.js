@@ -21,8 +21,7 @@ document.addEventListener('DOMContentLoaded', async () => {
 async function createPost() {
     const newAppointmentBody = {
         course_id: document.getElementById('courseSelect').value,
-        start_time: document.getElementById('timeFrom').value,
-        end_time: document.getElementById('timeTo').value,
+        ...clockTimesToIso(document.getElementById('timeFrom').value, document.getElementById('timeTo').value),
         location: document.getElementById('location').value,
         additional_info: document.getElementById('additionalInfo').value,
     };
@@ -40,8 +39,7 @@ async function createPost() {
 async function editPost() {
     const newAppointmentBody = {
         course_id: document.getElementById('courseSelect').value,
-        start_time: document.getElementById('timeFrom').value,
-        end_time: document.getElementById('timeTo').value,
+        ...clockTimesToIso(document.getElementById('timeFrom').value, document.getElementById('timeTo').value),
         location: document.getElementById('location').value,
         additional_info: document.getElementById('additionalInfo').value,
     };
@@ -19,22 +19,10 @@ let enrolledCourses = [];
 
 let currentUser = null;
 
-// Helper function to format time (e.g., 14:30 -> 2:30 PM)
-// 2022-05-06 14:30
-function formatTime(timeString) {
-    if (!timeString) return '';
-    try {
-        // const [hours, minutes] = timeString.split(':');
-        // const h = parseInt(hours, 10);
-        // const m = parseInt(minutes, 10);
-        // const ampm = h >= 12 ? 'PM' : 'AM';
-        // const formattedHours = h % 12 === 0 ? 12 : h % 12;
-        // const formattedMinutes = m < 10 ? '0' + m : m;
-        // return `${formattedHours}:${formattedMinutes} ${ampm}`;
-        return timeString.replaceAll('-', '/')
-    } catch (e) {
-        return "Time";
-    }
+// Helper function to format time (epoch seconds -> e.g. "Fri 2:30 PM", local time)
+function formatTime(epochSeconds) {
+    if (!epochSeconds) return '';
+    return new Date(epochSeconds * 1000).toLocaleString([], { weekday: 'short', hour: 'numeric', minute: '2-digit' });
 }
 
 async function drawFeed() {
@@ -46,42 +34,19 @@ async function drawFeed() {
     console.log(courseId)
     console.log(typeof courseId)
 
+    // Nothing to redraw if the feed is unchanged since the last draw
+    const allAppointments = await getFeed();
+    if (allAppointments === null) return;
+
     currentUser = await getCurrentUser();
     enrolledCourses = await getEnrolledCourses();
 
     const postFeedContainer = document.getElementById('all-post-container');
 
-    // Get posts from localStorage
-    const allAppointments = await getFeed();
-
-    // Filter new posts from localStorage by enrolled courses
-    let posts = await Promise.all(allAppointments
-        .map(async appt => {
-            // const courseCode = appt.courseName.split(':')[0].trim();
-            const course = await getCourse(appt.course_id)
-            const creator = await getCreator(appt.id)
-            return {
-                id: appt.id,
-                creatorId: appt.creator_student_id,
-                name: creator.name,
-                courseId: course.id,
-                courseName: course.name,
-                courseCode: course.code,
-                from: appt.start_time,
-                to: appt.end_time,
-                location: appt.location,
-                additional_info: appt.additional_info,
-                status: true
-            }
-        }))
-
-    if (!courseId) {
-        posts = posts
-            .filter(post => enrolledCourses.some(course => course.id === post.courseId));
-    } else {
-        posts = posts
-            .filter(post => Number(courseId) === post.courseId);
-    }
+    // Course and creator data come embedded in each feed entry
+    const posts = allAppointments
+        .map(toPost)
+        .filter(isShownHere);
 
     // Render filtered posts
     postFeedContainer.innerHTML = '';
@@ -92,19 +57,108 @@ async function drawFeed() {
     });
 
     if (posts.length === 0) {
-        const noPostsHTML = `<i>No posts found for you here...</i>`
-        postFeedContainer.insertAdjacentHTML('beforeend', noPostsHTML);
+        postFeedContainer.insertAdjacentHTML('beforeend', NO_POSTS_HTML);
     }
 }
 
-// --- Main Script ---
-document.addEventListener('DOMContentLoaded', drawFeed());
+const NO_POSTS_HTML = `<i id="no-posts">No posts found for you here...</i>`;
+
+function toPost(appt) {
+    return {
+        id: appt.id,
+        creatorId: appt.creator_student_id,
+        name: appt.creator_name,
+        courseId: appt.course_id,
+        courseName: appt.course_name,
+        courseCode: appt.course_code,
+        from: appt.start_time,
+        to: appt.end_time,
+        location: appt.location,
+        additional_info: appt.additional_info,
+        attendeeCount: appt.attendee_count,
+        status: true
+    };
+}
+
+// Whether a post belongs on this page (all enrolled courses, or the ?courseId= one)
+function isShownHere(post) {
+    const courseId = new URLSearchParams(window.location.search).get("courseId");
+    if (courseId) return Number(courseId) === post.courseId;
+    return enrolledCourses.some(course => course.id === post.courseId);
+}
+
+// Apply one server-pushed delta to the rendered feed
+function applyFeedEvent(event) {
+    if (event.type === 'resync') {
+        feedEtag = null;
+        drawFeed();
+        return;
+    }
 
-setInterval(drawFeed, 5000);
+    const container = document.getElementById('all-post-container');
+    const card = container.querySelector(`[data-appt-id="${event.appointment_id}"]`);
+
+    if (event.student_id === currentUser.id) {
+        currentUser.appointment_id = event.type === 'joined' ? event.appointment_id : null;
+    }
+
+    if (event.type === 'ended' || !event.appointment) {
+        if (card) card.remove();
+    } else {
+        const post = toPost(event.appointment);
+        if (!isShownHere(post)) return;
+        const html = createPostCardHTML(post);
+        if (card) card.outerHTML = html;
+        else container.insertAdjacentHTML('afterbegin', html);
+    }
+
+    const placeholder = document.getElementById('no-posts');
+    const hasPosts = container.querySelector('[data-appt-id]') !== null;
+    if (hasPosts && placeholder) placeholder.remove();
+    if (!hasPosts && !placeholder) container.insertAdjacentHTML('beforeend', NO_POSTS_HTML);
+}
+
+// Live updates over server-sent events; replaces polling /feed
+function connectFeedStream() {
+    const { access, refresh } = getTokens();
+    const source = new EventSource(`/feed/stream?token=${encodeURIComponent(access)}`);
+
+    source.onmessage = (msg) => applyFeedEvent(JSON.parse(msg.data));
+
+    // Deltas sent while the stream was down are lost: redraw in full once it is back
+    let dropped = false;
+    source.onopen = () => {
+        if (!dropped) return;
+        dropped = false;
+        feedEtag = null;
+        drawFeed();
+    };
+
+    source.onerror = async () => {
+        dropped = true;
+        if (source.readyState !== EventSource.CLOSED) return; // browser is retrying on its own
+        // Usually an expired access token: refresh, reconnect, and catch up on anything missed
+        try {
+            await refreshAccessToken(refresh);
+        } catch {
+            redirectToLogin();
+            return;
+        }
+        feedEtag = null;
+        connectFeedStream();
+        drawFeed();
+    };
+}
+
+// --- Main Script ---
+document.addEventListener('DOMContentLoaded', async () => {
+    await drawFeed();
+    connectFeedStream();
+});
 
 // This function creates the HTML for a single post card
 function createPostCardHTML(post) {
-    const avatarText = post.name.split(' ').map(n => n[0]).join('');
+    const avatarText = (post.name || '').split(' ').map(n => n[0]).join('');
     const timeString = (post.from && post.to) ? `${formatTime(post.from)} - ${formatTime(post.to)}` : '';
 
     const statusColor = true;
@@ -158,7 +212,7 @@ function createPostCardHTML(post) {
     // Note: data-coursecode="${post.courseCode}" is for the filter
     return `
     <div class="post-card bg-white p-6 rounded-lg shadow-lg border border-gray-200" 
-            data-coursecode="${post.id}">
+            data-coursecode="${post.id}" data-appt-id="${post.id}">
         
         <!-- Post Header -->
         <div class="flex items-center mb-4">
@@ -1,3 +1,4 @@
+// Courses currently listed in the modal: search results, or the enrolled courses when the box is empty
 let allCourses = []
 
 
@@ -40,11 +41,18 @@ async function populateCourses() {
     });
 }
 
+// Bumped per call, so a slow response for an older query can't overwrite a newer one
+let availableCoursesRequest = 0;
+
 // Function to populate available courses in modal
 async function populateAvailableCourses() {
+    const request = ++availableCoursesRequest;
     const availableCoursesDiv = document.getElementById('availableCourses');
     const enrolledCourses = await getEnrolledCourses();
-    console.log(enrolledCourses)
+    const query = document.getElementById('courseSearch').value.trim();
+    const courses = query ? await searchCourses(query) : enrolledCourses;
+    if (request !== availableCoursesRequest) return;
+    allCourses = courses;
 
     availableCoursesDiv.innerHTML = allCourses.map(course => {
         const isEnrolled = enrolledCourses.some(c => c.code === course.code);
@@ -95,6 +103,12 @@ document.getElementById('addCourseBtn').addEventListener('click', () => {
     populateAvailableCourses();
 });
 
+let searchTimer = null;
+document.getElementById('courseSearch').addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(populateAvailableCourses, 150);
+});
+
 document.getElementById('closeModal').addEventListener('click', () => {
     document.getElementById('courseModal').classList.add('hidden');
 });
@@ -141,9 +155,6 @@ function handleNotification(id, action) {
 
 // Initialize the page
 document.addEventListener('DOMContentLoaded', async () => {
-    // Initialize with some default courses if none exist
-    allCourses = await (await fetchWithAuth('/all_courses', { method: 'GET' })).json();
-    console.log(allCourses)
     populateCourses();
 });
 
@@ -2,11 +2,8 @@
 
     const data = await getCurrentUser();
 
-    let course_ids = data.courses
-
-    for (let i of course_ids) {
-        let course = await fetch(`/course/${i}`);
-    }
+    // One batch request for every enrolled course
+    const enrolledCourses = await getCourses(data.courses);
 
     document.title = data.name + "'s Profile";
 
@@ -21,8 +18,6 @@
 
         const courseList = document.getElementById('profileCourseList');
 
-        const enrolledCourses = await getEnrolledCourses();
-
         courseList.innerHTML = enrolledCourses.map(course =>
             `<li>${course.code}: ${course.name}</li>`
         ).join('');
@@ -19,8 +19,52 @@ async function saveEnrolledCourses(course_ids) {
     })
 }
 
+// ETag of the last feed we rendered; the server answers 304 while it still matches
+let feedEtag = null;
+
+// Returns the whole feed, or null when it hasn't changed since the last call.
+// The server sends it in pages; X-Next-Cursor is set while more follow.
 async function getFeed() {
-    const res = await fetchWithAuth('/feed/')
+    let res = await fetchWithAuth('/feed', {
+        cache: 'no-store',
+        headers: feedEtag ? { 'If-None-Match': feedEtag } : {}
+    })
+    if (res.status === 304) return null;
+    const etag = res.headers.get('ETag');
+    const feed = await res.json();
+    let cursor = res.headers.get('X-Next-Cursor');
+    while (cursor) {
+        res = await fetchWithAuth(`/feed?cursor=${encodeURIComponent(cursor)}`, { cache: 'no-store' })
+        if (!res.ok) return feed;
+        feed.push(...await res.json());
+        cursor = res.headers.get('X-Next-Cursor');
+    }
+    // Only remember the ETag once every page is in, so a partial feed is refetched next time
+    feedEtag = etag;
+    return feed;
+}
+
+// Appointment times travel as epoch seconds. <input type=time> gives "HH:MM":
+// read the pair as today's times, with an end at or before the start meaning tomorrow.
+function clockTimesToIso(from, to) {
+    const [start, end] = [from, to].map(clock => {
+        const [h, m] = clock.split(':');
+        const d = new Date();
+        d.setHours(Number(h), Number(m), 0, 0);
+        return d;
+    });
+    if (end <= start) end.setDate(end.getDate() + 1);
+    return { start_time: start.toISOString(), end_time: end.toISOString() };
+}
+
+// Epoch seconds -> "HH:MM" in local time, for <input type=time>
+function toClockTime(epochSeconds) {
+    return new Date(epochSeconds * 1000).toTimeString().slice(0, 5);
+}
+
+// Top matches for a course code/name query, ranked by the server
+async function searchCourses(q) {
+    const res = await fetch(`/courses/search?q=${encodeURIComponent(q)}`)
     return await res.json()
 }
 
@@ -29,6 +73,13 @@ async function getCourse(id) {
     return await res.json()
 }
 
+// Batch variant: one request for any number of ids
+async function getCourses(ids) {
+    if (!ids.length) return [];
+    const res = await fetch(`/courses?ids=${ids.join(',')}`)
+    return await res.json()
+}
+
 async function getAppointment(id) {
     const res = await fetch(`/appointment/${id}`)
     return await res.json()
@@ -0,0 +1,359 @@
+"""
+Load-test harness: a synthetic campus database plus concurrent simulated users
+driving the real app over HTTP.
+
+    python loadtest.py generate --students 5000 --appointments 400     # writes ./loadtest/main.db
+    python loadtest.py run --users 100 --duration 30                     # starts uvicorn on it and drives it
+    python loadtest.py run --url http://127.0.0.1:8000 --users 20        # or drive a server that's already up
+    python loadtest.py all --students 5000 --users 100 --json out.json   # both, results saved for comparison
+    python loadtest.py run --users 50 --abusers 5                        # plus clients ignoring rate limits
+
+Every simulated student's password is "password". Runs are reproducible for a
+given --seed (same data, same per-user action sequence); latencies are not.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+REPO_DIR = Path(__file__).parent.resolve()
+PASSWORD = "password"
+# Sign-ins answered 503 (password pool busy) or 429 (rate limited) are retried after Retry-After
+LOGIN_ATTEMPTS = 30
+
+# --- Synthetic dataset ---
+
+def generate(workdir: Path, students: int, courses_per_student: int, appointments: int,
+             attendees_per_appointment: int, seed: int) -> Path:
+    """Build a fresh workdir/main.db: courses.csv, `students` enrolled students and live appointments."""
+    from sqlalchemy import create_engine, insert, select, update
+    import db_spec
+    import importer
+    import passwords
+    from db_spec import Student, Course, Appointment, student_courses
+
+    rng = random.Random(seed)
+    workdir.mkdir(parents=True, exist_ok=True)
+    db_path = workdir / "main.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    db_spec.build_and_seed(db_path)
+
+    engine = create_engine(f"sqlite:///{db_path}", future=True)
+    importer.import_courses(engine, str(REPO_DIR / "courses.csv"))
+    started = time.perf_counter()
+    hashed = passwords.pwd_context.hash(PASSWORD)
+    now = int(time.time())
+
+    with engine.begin() as conn:
+        course_ids = conn.scalars(select(Course.id)).all()
+        conn.execute(insert(Student), [
+            {"name": f"Student {i}", "email": email(i), "hashed_password": hashed}
+            for i in range(students)
+        ])
+        student_ids = conn.scalars(select(Student.id).order_by(Student.id)).all()
+
+        roster = defaultdict(list)
+        pairs = []
+        for sid in student_ids:
+            for cid in rng.sample(course_ids, min(courses_per_student, len(course_ids))):
+                roster[cid].append(sid)
+                pairs.append({"student_id": sid, "course_id": cid})
+        conn.execute(insert(student_courses), pairs)
+
+        busy = set()
+        made = 0
+        for creator in rng.sample(student_ids, min(appointments, len(student_ids))):
+            if creator in busy:
+                continue
+            cid = rng.choice([p for p in roster if creator in roster[p]] or course_ids)
+            aid = conn.scalar(insert(Appointment).values(
+                creator_student_id=creator, course_id=cid,
+                start_time=now + rng.randint(-3600, 6 * 3600), end_time=now + rng.randint(7 * 3600, 24 * 3600),
+                location=f"Library room {rng.randint(1, 60)}", additional_info=None,
+            ).returning(Appointment.id))
+            free = [s for s in rng.sample(roster[cid], min(len(roster[cid]), 10)) if s not in busy and s != creator]
+            members = [creator, *free[:attendees_per_appointment]]
+            conn.execute(update(Student).where(Student.id.in_(members)).values(appointment_id=aid))
+            busy.update(members)
+            made += 1
+
+    print(f"Generated {students} students, {len(pairs)} enrollments, {made} appointments "
+          f"in {time.perf_counter() - started:.1f}s -> {db_path}")
+    return db_path
+
+def email(i: int) -> str:
+    return f"student{i}@load.test"
+
+# --- Simulated users ---
+
+class Stats:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.client_errors: dict[str, int] = defaultdict(int)
+        self.server_errors: dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, status: int):
+        self.samples[route].append(seconds)
+        if status >= 500:
+            self.server_errors[route] += 1
+        elif status >= 400:
+            self.client_errors[route] += 1
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+class User:
+    """One simulated student: logs in, then polls the feed and hosts, joins and leaves sessions."""
+
+    def __init__(self, client, stats: Stats, index: int, rng: random.Random, think: float):
+        self.client = client
+        self.stats = stats
+        self.index = index
+        self.rng = rng
+        self.think = think
+        self.headers = {}
+        self.feed_etag = None
+        self.feed = []
+        self.courses = []
+        self.appointment_id = None
+        self.hosting = False
+
+    async def call(self, method: str, route: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, headers={**self.headers, **kwargs.pop("headers", {})}, **kwargs)
+            status = r.status_code
+        except Exception:
+            r, status = None, 599
+        self.stats.record(route, time.perf_counter() - started, status)
+        return r
+
+    async def login(self):
+        for _ in range(LOGIN_ATTEMPTS):
+            r = await self.call("POST", "POST /auth/login", "/auth/login",
+                                data={"username": email(self.index), "password": PASSWORD})
+            if r is not None and r.status_code == 200:
+                break
+            if r is not None and r.status_code not in (429, 503):
+                raise RuntimeError(f"login failed for {email(self.index)}: {r.status_code}")
+            retry = r.headers.get("Retry-After", "1") if r is not None else "1"
+            await asyncio.sleep(float(retry) * (1 + self.rng.random()))
+        else:
+            raise RuntimeError(f"login kept failing for {email(self.index)}")
+        self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        r = await self.call("GET", "GET /current_user/", "/current_user/")
+        if r is not None and r.status_code == 200:
+            me = r.json()
+            self.courses = me["courses"]
+            self.appointment_id = me["appointment_id"]
+
+    async def poll_feed(self):
+        headers = {"If-None-Match": self.feed_etag} if self.feed_etag else {}
+        r = await self.call("GET", "GET /feed", "/feed", headers=headers)
+        if r is not None and r.status_code == 200:
+            self.feed_etag = r.headers.get("etag")
+            self.feed = r.json()
+
+    async def browse_catalog(self):
+        await self.call("GET", "GET /all_courses", "/all_courses")
+
+    async def browse_course(self):
+        if self.courses:
+            cid = self.rng.choice(self.courses)
+            await self.call("GET", "GET /get_appointments_for_course/{id}", f"/get_appointments_for_course/{cid}")
+
+    async def change_appointment(self):
+        if self.appointment_id is None:
+            others = [a["id"] for a in self.feed]
+            if others and self.rng.random() < 0.6:
+                aid = self.rng.choice(others)
+                r = await self.call("POST", "POST /join_appointment/{id}", f"/join_appointment/{aid}")
+                if r is not None and r.status_code == 200:
+                    self.appointment_id, self.hosting = aid, False
+            elif self.courses:
+                start = int(time.time()) + self.rng.randint(0, 6 * 3600)
+                body = {"course_id": self.rng.choice(self.courses), "start_time": start,
+                        "end_time": start + 7200, "location": "Load test", "additional_info": None}
+                r = await self.call("POST", "POST /create_appointment/", "/create_appointment/", json=body)
+                if r is not None and r.status_code == 200:
+                    self.appointment_id, self.hosting = r.json(), True
+        elif self.hosting:
+            await self.call("POST", "POST /end_appointment/", "/end_appointment/")
+            self.appointment_id, self.hosting = None, False
+        else:
+            r = await self.call("POST", "POST /leave_appointment/", "/leave_appointment/")
+            if r is not None and r.status_code in (200, 403):
+                # 403: we turned out to be the host (e.g. seeded data); end it instead next time
+                self.hosting = r.status_code == 403
+                if not self.hosting:
+                    self.appointment_id = None
+
+    async def run(self, deadline: float):
+        actions = [self.poll_feed, self.browse_catalog, self.browse_course, self.change_appointment]
+        weights = [60, 8, 17, 15]
+        while time.perf_counter() < deadline:
+            await self.rng.choices(actions, weights)[0]()
+            if self.think:
+                await asyncio.sleep(self.rng.uniform(0, 2 * self.think))
+
+class Abuser(User):
+    """A client ignoring the rules: polls /feed with no think time and keeps guessing its password."""
+
+    async def run(self, deadline: float):
+        while time.perf_counter() < deadline:
+            if self.rng.random() < 0.1:
+                await self.call("POST", "POST /auth/login", "/auth/login",
+                                data={"username": email(self.index), "password": "guess"})
+            else:
+                await self.call("GET", "GET /feed", "/feed")
+
+async def drive(url: str, users: int, duration: float, think: float, seed: int, students: int,
+                abusers: int = 0) -> tuple[Stats, Stats, Stats]:
+    """
+    Log every user in (ramp-up), then run the timed mix.
+    Returns (ramp-up stats, timed stats, abusers' timed stats).
+    """
+    import httpx
+
+    ramp_up, timed, abuse = Stats(), Stats(), Stats()
+    total = users + abusers
+    limits = httpx.Limits(max_connections=total, max_keepalive_connections=total)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        crowd = [
+            User(client, ramp_up, i % students, random.Random(seed * 100003 + i), think)
+            for i in range(users)
+        ]
+        rogues = [
+            Abuser(client, ramp_up, (users + i) % students, random.Random(seed * 100019 + i), 0)
+            for i in range(abusers)
+        ]
+        await asyncio.gather(*(u.login() for u in crowd + rogues))
+        for u in crowd:
+            u.stats = timed
+        for u in rogues:
+            u.stats = abuse
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(u.run(deadline) for u in crowd + rogues))
+    return ramp_up, timed, abuse
+
+def report(stats: Stats, duration: Optional[float]) -> dict:
+    """Print the per-route table. Throughput columns need a duration (the timed window)."""
+    rows = {}
+    print(f"\n{'route':40} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'4xx':>5} {'5xx':>5}")
+    for route in sorted(stats.samples):
+        values = sorted(stats.samples[route])
+        row = {
+            "count": len(values),
+            "rps": len(values) / duration if duration else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "client_errors": stats.client_errors[route],
+            "server_errors": stats.server_errors[route],
+        }
+        rows[route] = row
+        print(f"{route:40} {row['count']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['client_errors']:>5} {row['server_errors']:>5}")
+    if duration:
+        total = sum(r["count"] for r in rows.values())
+        print(f"\n{total} requests in {duration:.1f}s = {total / duration:.1f} req/s")
+    return rows
+
+# --- Server under test ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(workdir: Path) -> tuple[subprocess.Popen, str]:
+    """Run the real app with uvicorn against workdir/main.db; returns the process and its URL."""
+    import httpx
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--app-dir", str(REPO_DIR),
+         "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env={
+            **{k: v for k, v in os.environ.items() if k != "DATABASE_READ_URL"},
+            "DATABASE_URL": f"sqlite:///{(workdir / 'main.db').resolve()}",
+            "REAPER_INTERVAL_SECONDS": os.environ.get("REAPER_INTERVAL_SECONDS", "3600"),
+            # Every simulated user signs in from 127.0.0.1
+            "RATE_LIMIT_LOGIN_IP": os.environ.get("RATE_LIMIT_LOGIN_IP", "1000:1000"),
+        },
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(url + "/all_courses", timeout=1)
+            return proc, url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not come up")
+
+def run(args) -> dict:
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(Path(args.workdir))
+    try:
+        extra = f" and {args.abusers} abusers" if args.abusers else ""
+        print(f"Driving {url} with {args.users} users{extra} for {args.duration:.0f}s")
+        ramp_up, timed, abuse = asyncio.run(drive(
+            url, args.users, args.duration, args.think / 1000, args.seed, args.students, args.abusers,
+        ))
+        print("\nRamp-up (sign-in)", end="")
+        report(ramp_up, None)
+        print("\nSteady state", end="")
+        results = report(timed, args.duration)
+        if args.abusers:
+            print("\nAbusers", end="")
+            report(abuse, args.duration)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+    if args.json:
+        Path(args.json).write_text(json.dumps(
+            {"users": args.users, "duration": args.duration, "think_ms": args.think, "routes": results}, indent=2
+        ))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["generate", "run", "all"])
+    parser.add_argument("--workdir", default="loadtest", help="where the synthetic main.db lives")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--courses-per-student", type=int, default=4)
+    parser.add_argument("--appointments", type=int, default=200)
+    parser.add_argument("--attendees", type=int, default=2, help="seeded attendees per appointment")
+    parser.add_argument("--url", help="drive this server instead of starting one")
+    parser.add_argument("--users", type=int, default=50, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think", type=float, default=250, help="mean think time between actions, ms")
+    parser.add_argument("--abusers", type=int, default=0, help="extra users hammering /feed and guessing passwords")
+    parser.add_argument("--json", help="also write the per-route results here")
+    args = parser.parse_args()
+
+    if args.command in ("generate", "all"):
+        generate(Path(args.workdir), args.students, args.courses_per_student, args.appointments,
+                 args.attendees, args.seed)
+    if args.command in ("run", "all"):
+        run(args)
@@ -1,23 +1,8 @@
-import db_spec
-from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
-import csv
-
-engine = create_engine(f"sqlite:///main.db", echo=False, future=True)
-with Session(engine) as session:
-    courses = []
-
-    with open('courses.csv') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            course = db_spec.Course(
-                code=row['code'],
-                name=row['name']   
-            )
-
-            courses.append(course)
-        
-    session.add_all(courses)
-    session.flush()
-    session.commit()
-
+import importer
+import migrations
+from engine import start_engine, get_engine
+
+# Load (or refresh) the course catalog from courses.csv; safe to re-run
+start_engine()
+migrations.upgrade(get_engine())
+importer.import_courses(get_engine(), 'courses.csv')
@@ -0,0 +1,145 @@
+import os
+import threading
+from contextvars import ContextVar
+from typing import Optional
+
+# Per-route request metrics, rendered in the Prometheus text format on /metrics.
+# The HTTP middleware in app.py opens a RequestStats for each request; the
+# SQLAlchemy hooks in engine.py, the password pool and fastjson add to whichever one is
+# current (run_db copies the context into the DB threads). Work done outside a
+# request (reaper, CLI tools) is booked under the "(background)" route.
+
+# Latency histogram upper bounds, seconds
+LATENCY_BUCKETS = tuple(
+    float(b) for b in os.environ.get(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")
+)
+# Statements slower than this are printed with their route; 0 disables the log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+
+BACKGROUND = ("-", "(background)")
+
+class RequestStats:
+    __slots__ = ("label", "statements", "db_seconds", "rows", "password_seconds", "json_seconds")
+
+    def __init__(self, label: str = BACKGROUND[1]):
+        self.label = label  # "GET /feed" as requested, for the slow-query log
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.password_seconds = 0.0
+        self.json_seconds = 0.0
+
+class _Route:
+    __slots__ = ("buckets", "count", "seconds", "statuses", "totals")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses: dict[int, int] = {}
+        self.totals = RequestStats()
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_lock = threading.Lock()
+_routes: dict[tuple[str, str], _Route] = {}
+_background = RequestStats()
+_slow_queries = 0
+
+def begin_request(label: str) -> RequestStats:
+    stats = RequestStats(label)
+    _current.set(stats)
+    return stats
+
+def _stats() -> RequestStats:
+    return _current.get() or _background
+
+def record_query(statement: str, seconds: float):
+    global _slow_queries
+    stats = _stats()
+    with _lock:
+        stats.statements += 1
+        stats.db_seconds += seconds
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        with _lock:
+            _slow_queries += 1
+        print(f"Slow query ({seconds * 1000:.1f} ms, {stats.label}): {' '.join(statement.split())}")
+
+def record_rows(n: int):
+    stats = _stats()
+    with _lock:
+        stats.rows += n
+
+def record_password(seconds: float):
+    stats = _stats()
+    with _lock:
+        stats.password_seconds += seconds
+
+def record_json(seconds: float):
+    stats = _stats()
+    with _lock:
+        stats.json_seconds += seconds
+
+def end_request(method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    with _lock:
+        r = _routes.get((method, route))
+        if r is None:
+            r = _routes[(method, route)] = _Route()
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                r.buckets[i] += 1
+                break
+        r.count += 1
+        r.seconds += seconds
+        r.statuses[status] = r.statuses.get(status, 0) + 1
+        t = r.totals
+        t.statements += stats.statements
+        t.db_seconds += stats.db_seconds
+        t.rows += stats.rows
+        t.password_seconds += stats.password_seconds
+        t.json_seconds += stats.json_seconds
+
+def _labels(method: str, route: str, **extra) -> str:
+    pairs = {"method": method, "route": route, **extra}
+    return ",".join(f'{k}="{v}"' for k, v in pairs.items())
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        routes = sorted(_routes.items())
+        rows = [(key, r.totals) for key, r in routes] + [(BACKGROUND, _background)]
+        out = [
+            "# HELP tandem_http_request_duration_seconds Request latency by route.",
+            "# TYPE tandem_http_request_duration_seconds histogram",
+        ]
+        for (method, route), r in routes:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, r.buckets):
+                cumulative += n
+                out.append(f'tandem_http_request_duration_seconds_bucket{{{_labels(method, route, le=bound)}}} {cumulative}')
+            out.append(f'tandem_http_request_duration_seconds_bucket{{{_labels(method, route, le="+Inf")}}} {r.count}')
+            out.append(f'tandem_http_request_duration_seconds_sum{{{_labels(method, route)}}} {r.seconds:.6f}')
+            out.append(f'tandem_http_request_duration_seconds_count{{{_labels(method, route)}}} {r.count}')
+
+        out += ["# HELP tandem_http_requests_total Responses by route and status.",
+                "# TYPE tandem_http_requests_total counter"]
+        for (method, route), r in routes:
+            for status, n in sorted(r.statuses.items()):
+                out.append(f'tandem_http_requests_total{{{_labels(method, route, status=status)}}} {n}')
+
+        for name, attr, help_text, fmt in (
+            ("tandem_db_statements_total", "statements", "SQL statements executed.", "{}"),
+            ("tandem_db_seconds_total", "db_seconds", "Time spent executing SQL, including lock waits.", "{:.6f}"),
+            ("tandem_db_rows_total", "rows", "Rows fetched from SQL results.", "{}"),
+            ("tandem_password_seconds_total", "password_seconds", "Time spent waiting on Argon2 hashing.", "{:.6f}"),
+            ("tandem_json_seconds_total", "json_seconds", "Time spent encoding FastJSONResponse bodies.", "{:.6f}"),
+        ):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, route), totals in rows:
+                out.append(f"{name}{{{_labels(method, route)}}} {fmt.format(getattr(totals, attr))}")
+
+        out += ["# HELP tandem_db_slow_queries_total Statements slower than SLOW_QUERY_MS.",
+                "# TYPE tandem_db_slow_queries_total counter",
+                f"tandem_db_slow_queries_total {_slow_queries}"]
+    return "\n".join(out) + "\n"
@@ -0,0 +1,269 @@
+"""
+Versioned, in-place schema migrations for the db_spec models.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Each migration
+runs once, in order, and must be safe to re-run (IF NOT EXISTS etc.) in case
+two workers start at the same time.
+
+    python migrations.py            # upgrade main.db to the latest version
+    python migrations.py explain    # print EXPLAIN QUERY PLAN for every db_utils query
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import Engine, event, select, text
+
+from db_spec import Course
+
+# Tables as of the first release, frozen: db_spec describes the latest schema,
+# which later migrations reach from here. Never edit; add a migration instead.
+_BASELINE_DDL = [
+    """CREATE TABLE IF NOT EXISTS students (
+        id INTEGER NOT NULL,
+        name VARCHAR NOT NULL,
+        email VARCHAR,
+        hashed_password VARCHAR NOT NULL,
+        appointment_id INTEGER,
+        PRIMARY KEY (id),
+        UNIQUE (email),
+        FOREIGN KEY(appointment_id) REFERENCES appointments (id) ON DELETE SET NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_students_appointment_id ON students (appointment_id)",
+    """CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER NOT NULL,
+        code VARCHAR NOT NULL,
+        name VARCHAR NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (code)
+    )""",
+    """CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER NOT NULL,
+        creator_student_id INTEGER,
+        course_id INTEGER,
+        start_time VARCHAR,
+        end_time VARCHAR,
+        additional_info TEXT,
+        location VARCHAR,
+        PRIMARY KEY (id),
+        FOREIGN KEY(creator_student_id) REFERENCES students (id) ON DELETE SET NULL,
+        FOREIGN KEY(course_id) REFERENCES courses (id) ON DELETE SET NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS student_courses (
+        student_id INTEGER NOT NULL,
+        course_id INTEGER NOT NULL,
+        PRIMARY KEY (student_id, course_id),
+        FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE,
+        FOREIGN KEY(course_id) REFERENCES courses (id) ON DELETE CASCADE
+    )""",
+]
+
+def _baseline(conn):
+    # A no-op on databases that already have the tables
+    for ddl in _BASELINE_DDL:
+        conn.exec_driver_sql(ddl)
+
+def _hot_path_indexes(conn):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_course_id_start_time "
+        "ON appointments (course_id, start_time)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_student_courses_course_id "
+        "ON student_courses (course_id, student_id)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_creator_student_id "
+        "ON appointments (creator_student_id)"
+    )
+
+def _epoch_appointment_times(conn):
+    """
+    appointments.start_time/end_time: free-form TEXT -> INTEGER epoch seconds.
+    Strings are parsed like API input (bare clock times are today's); anything
+    missing or unparseable becomes "ended now" so the reaper clears it.
+    """
+    import timestamps
+
+    columns = {row[1]: row[2].upper() for row in conn.exec_driver_sql("PRAGMA table_info(appointments)")}
+    if columns["start_time"] != "INTEGER":
+        if "start_ts" not in columns:
+            conn.exec_driver_sql("ALTER TABLE appointments ADD COLUMN start_ts INTEGER")
+            conn.exec_driver_sql("ALTER TABLE appointments ADD COLUMN end_ts INTEGER")
+
+        now = int(time.time())
+        converted, unparseable = [], 0
+        for appt_id, start, end in conn.exec_driver_sql("SELECT id, start_time, end_time FROM appointments"):
+            try:
+                if start is None or end is None:
+                    raise ValueError("missing time")
+                start_ts, end_ts = timestamps.to_window(start, end)
+                for ts in (start_ts, end_ts):
+                    datetime.fromtimestamp(ts)  # raises past year 9999, which SQLite can't store either
+            except Exception:  # NULL, garbage, out of range: don't let one row stop the upgrade
+                start_ts = end_ts = now
+                unparseable += 1
+            converted.append({"id": appt_id, "start_ts": start_ts, "end_ts": end_ts})
+        if converted:
+            conn.execute(
+                text("UPDATE appointments SET start_ts = :start_ts, end_ts = :end_ts WHERE id = :id"), converted
+            )
+        if unparseable:
+            print(f"  {unparseable} appointment(s) had unreadable times and will be reaped")
+
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_appointments_course_id_start_time")
+        conn.exec_driver_sql("ALTER TABLE appointments DROP COLUMN start_time")
+        conn.exec_driver_sql("ALTER TABLE appointments DROP COLUMN end_time")
+        conn.exec_driver_sql("ALTER TABLE appointments RENAME COLUMN start_ts TO start_time")
+        conn.exec_driver_sql("ALTER TABLE appointments RENAME COLUMN end_ts TO end_time")
+
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_appointments_course_id_start_time "
+        "ON appointments (course_id, start_time)"
+    )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_appointments_end_time ON appointments (end_time)")
+
+def _change_log(conn):
+    # Same definition as db_spec.change_log
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS change_log ("
+        "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, origin VARCHAR NOT NULL, "
+        "created_at INTEGER NOT NULL, payload TEXT NOT NULL)"
+    )
+
+def _clock_change_ids(conn):
+    # change_log ids are the ETag versions (versions.py). Start them from the clock
+    # in microseconds, so a recreated database never reissues one a browser holds.
+    seq = int(time.time() * 1_000_000)
+    conn.exec_driver_sql("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'change_log'", (seq,))
+    conn.exec_driver_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'change_log', ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'change_log')",
+        (seq,),
+    )
+
+# (version, description, migration); append only, never reorder or edit a shipped entry
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "hot-path indexes for feed, enrollment and reaper queries", _hot_path_indexes),
+    (3, "appointment times as indexed epoch seconds", _epoch_appointment_times),
+    (4, "change log for cross-process cache invalidation", _change_log),
+    (5, "change log ids (ETag versions) seeded from the clock", _clock_change_ids),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(engine: Engine) -> int:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def upgrade(engine: Engine) -> int:
+    """Apply every pending migration. Returns the resulting schema version."""
+    version = current_version(engine)
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {target}")
+        print(f"Migrated schema to v{target}: {description}")
+        version = target
+    return version
+
+# --- Query plan report ---
+
+def _sample_courses(db_utils) -> list[int]:
+    with db_utils.session_scope() as s:
+        course_ids = s.scalars(select(Course.id).order_by(Course.id).limit(2)).all()
+        if len(course_ids) < 2:
+            s.add_all([Course(code="EXPLAIN 1", name="Explain"), Course(code="EXPLAIN 2", name="Explain")])
+            s.flush()
+            course_ids = s.scalars(select(Course.id).order_by(Course.id).limit(2)).all()
+        return course_ids
+
+def _exercise(db_utils, course_ids: list[int]):
+    """Call every db_utils query path once, against throwaway rows."""
+    host = db_utils.create_student("Explain Host", "explain-host@plan.invalid", "-")
+    guest = db_utils.create_student("Explain Guest", "explain-guest@plan.invalid", "-")
+    db_utils.set_courses_for_student(host, course_ids)
+    db_utils.set_courses_for_student(guest, course_ids)
+    db_utils.remove_course_for_student(guest, course_ids[1])
+    db_utils.add_course_for_student(guest, course_ids[1])
+
+    now = int(time.time())
+    aid = db_utils.create_appointment(host, course_ids[0], now, now + 3600, "Library", None)
+    db_utils.add_attendee_to_appointment(aid, guest)
+    db_utils.get_feed_for_student(guest, since=now, after=(now, 0), limit=50)
+    db_utils.get_feed_entry(aid)
+    db_utils.get_appointments_for_course(course_ids[0], since=now, until=now + 86400, after=(now, 0), limit=50)
+    db_utils.get_courses_for_student(guest)
+    db_utils.get_course_dict(course_ids[0])
+    db_utils.get_appointment_dict(aid)
+    db_utils.get_student_dict(guest)
+    db_utils.get_student_appointment(guest)
+    db_utils.get_attending_students(aid)
+    db_utils.get_creator(aid)
+    db_utils.get_student_from_email("explain-guest@plan.invalid")
+    db_utils.get_all_courses()
+    db_utils.get_enrollments()
+    db_utils.get_appointment_times()
+    db_utils.get_feed_entries([aid])
+    db_utils.get_study_partners([(host, course_ids)])
+    db_utils.remove_attendee_from_appointment(aid, guest)
+    db_utils.edit_appointment(aid, now, now + 7200, "Library", "notes")
+    db_utils.set_password_hash(guest, "-")
+    db_utils.reap_appointments()
+    db_utils.end_appointment(aid)
+
+def _one_line(sql: str, width: int = 110) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= width else sql[:width - 3] + "..."
+
+def explain(engine: Engine):
+    """
+    Run every db_utils query inside one transaction that is rolled back at the
+    end, and print SQLite's query plan for each distinct statement. Plans that
+    scan a table without an index are flagged.
+    """
+    import db_utils
+
+    captured: dict[str, tuple] = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            captured.setdefault(statement, parameters)
+
+    with engine.connect() as conn:
+        outer = conn.begin()
+        # Readonly sessions go through read_engine; point both at the transaction
+        saved = db_utils.engine, db_utils.read_engine
+        db_utils.engine = db_utils.read_engine = conn
+        course_ids = _sample_courses(db_utils)
+        event.listen(conn, "before_cursor_execute", capture)
+        try:
+            _exercise(db_utils, course_ids)
+        finally:
+            event.remove(conn, "before_cursor_execute", capture)
+            db_utils.engine, db_utils.read_engine = saved
+
+        full_scans = 0
+        for sql, params in captured.items():
+            print(_one_line(sql))
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params):
+                detail = row[-1]
+                scan = detail.startswith("SCAN ") and " USING " not in detail
+                full_scans += scan
+                print(f"    {detail}{'   <-- FULL SCAN' if scan else ''}")
+        outer.rollback()
+
+    print(f"\n{len(captured)} statements, {full_scans} full table scan(s)")
+
+if __name__ == "__main__":
+    import sys
+    from engine import start_engine, get_engine
+
+    start_engine()
+    if sys.argv[1:] == ["explain"]:
+        upgrade(get_engine())
+        explain(get_engine())
+    else:
+        print(f"Schema at v{upgrade(get_engine())}")
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+
+import timestamps
 
 class NewStudent(BaseModel):
     name: str
@@ -6,12 +8,20 @@ class NewStudent(BaseModel):
     password: str
 
 class NewAppointment(BaseModel):
-    start_time: str
-    end_time: str
+    # ISO-8601 datetimes, epoch seconds or bare "HH:MM" (today); epoch seconds once validated
+    start_time: int|str
+    end_time: int|str
     course_id: int 
     location: str
     additional_info: None|str = None
 
+    @model_validator(mode="after")
+    def to_epochs(self):
+        self.start_time, self.end_time = timestamps.to_window(self.start_time, self.end_time)
+        if self.end_time <= self.start_time:
+            raise ValueError("end_time must be after start_time")
+        return self
+
 class NewCourse(BaseModel):
     code: str
     name: str
@@ -1,10 +1,14 @@
+from datetime import datetime
 from sqlalchemy import select, Engine
 from sqlalchemy.orm import Session
 from db_spec import Base, Student, Course, Appointment  # import your models
-from engine import get_engine, start_engine
+from engine import get_read_engine, start_engine
+
+def time_str(epoch: int | None):
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M") if epoch is not None else None
 
 def appointment_str(a: Appointment):
-    return (f"{a.id}: {a.start_time} → {a.end_time}") \
+    return (f"{a.id}: {time_str(a.start_time)} → {time_str(a.end_time)}") \
     + f"  Location: {a.location}" \
     + f"  Creator: {a.creator.name if a.creator else None}" \
     + f"  Course: {a.course.code if a.course else None}" \
@@ -36,4 +40,4 @@ def print_contents(engine: Engine):
 
 if __name__ == "__main__":
     start_engine()
-    print_contents(get_engine())
+    print_contents(get_read_engine())
@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+import metrics
+
+# Argon2 hashing/verification, run on a small dedicated process pool so a burst
+# of logins can't starve the request workers. Cost parameters come from env;
+# hashes made with other parameters are flagged for re-hash on the next login.
+# The pool's processes are spawned, not forked: a forked child would inherit
+# the server's listening socket, SQLite handles and uvicorn's signal handlers,
+# and could outlive the server while holding the port.
+
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", "4"))
+
+# Worker processes, and how many hash jobs may be running or waiting before we shed load
+PASSWORD_WORKERS = int(os.environ.get("PASSWORD_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", "32"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+class PasswordPoolBusy(Exception):
+    """Raised instead of queueing when PASSWORD_QUEUE_LIMIT jobs are already pending."""
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+# Hash of a random password with the current parameters; see verify_dummy()
+_dummy_hash: Optional[str] = None
+
+def _init_worker():
+    # Ctrl+C goes to the whole process group; leave stopping to shutdown_pool(), and die on SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+    return _pool
+
+def shutdown_pool():
+    """Stop the pool and wait for its processes to exit (at most one hash each)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+# Run inside the worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_QUEUE_LIMIT:
+        raise PasswordPoolBusy()
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        _pending -= 1
+        metrics.record_password(time.perf_counter() - started)
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """
+    Returns (verified, new_hash). new_hash is set when the stored hash was made
+    with outdated parameters and should be replaced.
+    """
+    return await _submit(_verify_and_update, password, hashed)
+
+async def verify_dummy(password: str):
+    """
+    Cost the same as verify_password() and match nothing. For logins with an
+    unknown email, so response time doesn't reveal which emails are registered.
+    """
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password(secrets.token_urlsafe(16))
+    await _submit(_verify_and_update, password, _dummy_hash)
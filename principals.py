@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+# Bounded TTL/LRU cache of resolved principals for get_current_user, keyed by
+# (token subject, token exp). db_utils invalidates a student's entries whenever
+# it changes something in their principal (courses, appointment, account).
+
+MAX_ENTRIES = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000"))
+TTL_SECONDS = float(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple[str, int], tuple[float, dict]]" = OrderedDict()
+_keys_by_student: dict[int, set[tuple[str, int]]] = {}
+# Bumped on every invalidation so a lookup that raced with a write doesn't store stale data
+_generation = 0
+
+def generation() -> int:
+    """Take before reading the principal from the database; pass to put()."""
+    return _generation
+
+def get(subject: str, exp: int) -> dict | None:
+    key = (subject, exp)
+    with _lock:
+        hit = _entries.get(key)
+        if hit is None:
+            return None
+        expires_at, principal = hit
+        if expires_at <= time.time():
+            _drop(key)
+            return None
+        _entries.move_to_end(key)
+        return principal
+
+def put(subject: str, exp: int, principal: dict, since_generation: int):
+    key = (subject, exp)
+    with _lock:
+        if since_generation != _generation:
+            return
+        _drop(key)
+        _entries[key] = (min(time.time() + TTL_SECONDS, exp), principal)
+        _keys_by_student.setdefault(principal["id"], set()).add(key)
+        while len(_entries) > MAX_ENTRIES:
+            _drop(next(iter(_entries)))
+
+def invalidate_students(student_ids: Iterable[int | None]):
+    global _generation
+    with _lock:
+        _generation += 1
+        for sid in student_ids:
+            for key in _keys_by_student.pop(sid, ()):
+                _entries.pop(key, None)
+
+def invalidate_all():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _keys_by_student.clear()
+
+def _drop(key: tuple[str, int]):
+    hit = _entries.pop(key, None)
+    if hit is None:
+        return
+    sid = hit[1]["id"]
+    keys = _keys_by_student.get(sid)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _keys_by_student[sid]
@@ -0,0 +1,87 @@
+import math
+import os
+import time
+from collections import OrderedDict
+
+# Admission control. Per-client token buckets cap how fast one student (or one
+# IP, before sign-in) can hit the expensive routes, and an in-flight cap sheds
+# load globally before queues build up. Everything here is called from the event
+# loop (app.py's route dependencies and middleware), so there are no locks.
+# Buckets are per worker process: with N workers a client can get up to N times
+# a budget, which still stops runaway tabs and password guessing.
+
+RATE_LIMITING = os.environ.get("RATE_LIMITING", "1") != "0"
+
+def _budget(name: str, rate: float, burst: float) -> tuple[float, float]:
+    """(tokens per second, bucket size); override with RATE_LIMIT_<NAME>="rate:burst"."""
+    value = os.environ.get(f"RATE_LIMIT_{name.upper()}")
+    if value:
+        rate, burst = value.split(":")
+    return float(rate), float(burst)
+
+BUDGETS = {
+    # Each sign-in costs an Argon2 verify: limit per IP, and failures per account
+    "login_ip": _budget("login_ip", 1, 20),
+    "login_account": _budget("login_account", 1 / 15, 5),
+    "signup": _budget("signup", 0.1, 5),
+    "feed": _budget("feed", 5, 30),
+    "stream": _budget("stream", 0.2, 5),  # EventSource reconnects
+    "search": _budget("search", 10, 40),  # typeahead, one request per keystroke
+    "write": _budget("write", 2, 20),
+    "debug": _budget("debug", 0.2, 2),
+}
+# Least recently used buckets beyond this are dropped (i.e. refilled)
+MAX_BUCKETS = int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", "100000"))
+# Requests this worker serves at once before it answers 503 instead
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", "256"))
+
+# (budget, key) -> [tokens, refilled_at]
+_buckets: "OrderedDict[tuple[str, str], list[float]]" = OrderedDict()
+_in_flight = 0
+
+def _bucket(budget: str, key: str) -> tuple[list[float], float]:
+    rate, burst = BUDGETS[budget]
+    now = time.monotonic()
+    bucket = _buckets.get((budget, key))
+    if bucket is None:
+        bucket = _buckets[(budget, key)] = [burst, now]
+        if len(_buckets) > MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end((budget, key))
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+    return bucket, rate
+
+def peek(budget: str, key: str) -> float:
+    """Seconds until `key` has a token in `budget`; 0 if it has one now. Spends nothing."""
+    if not RATE_LIMITING:
+        return 0.0
+    bucket, rate = _bucket(budget, key)
+    return 0.0 if bucket[0] >= 1 else (1 - bucket[0]) / rate
+
+def take(budget: str, key: str) -> float:
+    """Spend one of `key`'s tokens in `budget`. Returns 0 if allowed, else seconds until one is available."""
+    if not RATE_LIMITING:
+        return 0.0
+    bucket, rate = _bucket(budget, key)
+    if bucket[0] >= 1:
+        bucket[0] -= 1
+        return 0.0
+    return (1 - bucket[0]) / rate
+
+def retry_after(seconds: float) -> str:
+    """A Retry-After header value (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(seconds)))
+
+def admit() -> bool:
+    """Count a request in, or return False if MAX_IN_FLIGHT are already being served."""
+    global _in_flight
+    if _in_flight >= MAX_IN_FLIGHT:
+        return False
+    _in_flight += 1
+    return True
+
+def release():
+    global _in_flight
+    _in_flight -= 1
@@ -0,0 +1,171 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, Optional
+
+# Per-course interval index over appointment times, for "what's on at T / in
+# [from, to)" queries without SQL. Built from the database on first use, then
+# kept current by the "scheduled" (create, edit) and "unscheduled" (end, reaper)
+# changes db_utils queues (see changes.py).
+#
+# An appointment overlaps [since, until) if it is running at `since`, or starts
+# after `since` but before `until`. Each course answers the first half with a
+# centred interval tree and the second with a bisect into its starts sorted by
+# (start, id), so a query costs O(log n + k) however long any appointment is.
+# The tree is rebuilt (O(n log n)) on the first query after a change.
+
+class _Node:
+    """
+    Centred interval tree node: the intervals containing `center`, sorted by
+    start and by end, with the ones wholly left and right of it below.
+    """
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, spans: list[tuple[int, int, int]]):
+        points = sorted(p for start, end, _ in spans for p in (start, end))
+        self.center = points[len(points) // 2]
+        here = [s for s in spans if s[0] <= self.center <= s[1]]
+        left = [s for s in spans if s[1] < self.center]
+        right = [s for s in spans if s[0] > self.center]
+        self.by_start = sorted(here)
+        self.by_end = sorted(here, key=lambda s: s[1], reverse=True)
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+def _stab(node: Optional[_Node], at: int, out: list[tuple[int, int]]):
+    """Add (start, id) of every interval with start <= at <= end."""
+    while node is not None:
+        if at < node.center:
+            for start, _, aid in node.by_start:
+                if start > at:
+                    break
+                out.append((start, aid))
+            node = node.left
+        elif at > node.center:
+            for start, end, aid in node.by_end:
+                if end < at:
+                    break
+                out.append((start, aid))
+            node = node.right
+        else:
+            out.extend((start, aid) for start, _, aid in node.by_start)
+            return
+
+class CourseTimes:
+    def __init__(self):
+        self.starts: list[tuple[int, int]] = []  # (start, appointment id), sorted
+        self.spans: dict[int, tuple[int, int]] = {}  # appointment id -> (start, end)
+        self._tree: Optional[_Node] = None  # None: rebuild before the next query
+
+    def add(self, appointment_id: int, start: int, end: int):
+        self.remove(appointment_id)
+        end = max(start, end)  # the tree needs start <= end
+        insort(self.starts, (start, appointment_id))
+        self.spans[appointment_id] = (start, end)
+        self._tree = None
+
+    def remove(self, appointment_id: int):
+        span = self.spans.pop(appointment_id, None)
+        if span is None:
+            return
+        del self.starts[bisect_left(self.starts, (span[0], appointment_id))]
+        self._tree = None
+
+    def overlapping(self, since: int, until: int) -> list[tuple[int, int]]:
+        """(start, id) of the appointments still running at `since` and starting before `until`."""
+        if self._tree is None and self.spans:
+            self._tree = _Node([(start, end, aid) for aid, (start, end) in self.spans.items()])
+        hits: list[tuple[int, int]] = []
+        _stab(self._tree, since, hits)
+        lo = bisect_right(self.starts, (since, float("inf")))
+        hi = bisect_left(self.starts, (until,))
+        hits.extend(self.starts[lo:hi])
+        return hits
+
+class Index:
+    def __init__(self, rows: Iterable[tuple[int, Optional[int], int, int]]):
+        self.by_course: dict[Optional[int], CourseTimes] = {}
+        self.course_of: dict[int, Optional[int]] = {}
+        for appointment_id, course_id, start, end in rows:
+            self.put(appointment_id, course_id, start, end)
+
+    def put(self, appointment_id: int, course_id: Optional[int], start: int, end: int):
+        if self.course_of.get(appointment_id, course_id) != course_id:
+            self.drop(appointment_id)
+        self.course_of[appointment_id] = course_id
+        self.by_course.setdefault(course_id, CourseTimes()).add(appointment_id, start, end)
+
+    def drop(self, appointment_id: int):
+        if appointment_id not in self.course_of:
+            return
+        course_id = self.course_of.pop(appointment_id)
+        times = self.by_course[course_id]
+        times.remove(appointment_id)
+        if not times.spans:
+            del self.by_course[course_id]
+
+    def active(self, course_ids: Iterable[int], since: int, until: int, limit: int) -> list[int]:
+        hits = []
+        for cid in set(course_ids):
+            times = self.by_course.get(cid)
+            if times is not None:
+                hits.extend(times.overlapping(since, until))
+        hits.sort()
+        return [aid for _, aid in hits[:limit]]
+
+_lock = threading.Lock()
+_current: Optional[Index] = None
+# Bumped on every update so a build that raced with one isn't published
+_generation = 0
+
+def get() -> Index:
+    """The index, built from the database on first use."""
+    global _current
+    idx = _current
+    if idx is not None:
+        return idx
+    import db_utils
+
+    with _lock:
+        generation = _generation
+    idx = Index(db_utils.get_appointment_times())
+    with _lock:
+        if _current is None and generation == _generation:
+            _current = idx
+        return _current or idx
+
+def cached() -> Optional[Index]:
+    """The index if it is built, without touching the database."""
+    return _current
+
+def active(course_ids: Iterable[int], since: int, until: int, limit: int) -> list[int]:
+    """
+    Ids of the appointments in `course_ids` still running at `since` and
+    starting before `until` (epoch seconds), soonest first, at most `limit`.
+    """
+    idx = get()
+    with _lock:
+        return idx.active(course_ids, since, until, limit)
+
+def put(appointment_id: int, course_id: Optional[int], start: int, end: int):
+    """An appointment was created or rescheduled. Call only after it committed."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if _current is not None:
+            _current.put(appointment_id, course_id, start, end)
+
+def drop(appointment_ids: Iterable[int]):
+    """Appointments were ended or reaped. Call only after it committed."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if _current is not None:
+            for aid in appointment_ids:
+                _current.drop(aid)
+
+def invalidate():
+    """Drop the index; the next query rebuilds it."""
+    global _current, _generation
+    with _lock:
+        _generation += 1
+        _current = None
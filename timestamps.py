@@ -0,0 +1,28 @@
+import re
+from datetime import date, datetime, timedelta
+
+# Appointment times are stored as Unix epoch seconds. Clients send ISO-8601
+# datetimes ("2025-11-07T21:30:00Z", "2025-11-07 21:30"); naive values are taken
+# as server-local time. Bare clock times ("21:30", what <input type=time> gives)
+# are taken to be today's, and an end at or before its start means the next day.
+
+_CLOCK = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?$")
+
+def to_epoch(value: str | int | float, today: date | None = None) -> int:
+    """Parse one appointment time. Raises ValueError if it isn't a time we understand."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = value.strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    if _CLOCK.match(text):
+        clock = datetime.strptime(text if text.count(":") == 2 else text + ":00", "%H:%M:%S").time()
+        return int(datetime.combine(today or date.today(), clock).timestamp())
+    return int(datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp())
+
+def to_window(start: str | int | float, end: str | int | float, today: date | None = None) -> tuple[int, int]:
+    """Parse a start/end pair; a bare end clock time at or before the start rolls over to the next day."""
+    start_ts, end_ts = to_epoch(start, today), to_epoch(end, today)
+    if isinstance(end, str) and _CLOCK.match(end.strip()) and end_ts <= start_ts:
+        end_ts = int((datetime.fromtimestamp(end_ts) + timedelta(days=1)).timestamp())
+    return start_ts, end_ts
@@ -0,0 +1,56 @@
+import hashlib
+import threading
+from typing import Iterable
+
+# Per-course change versions. A course's version is the id of the last
+# change_log row (see changes.py) that touched it. Ids come from the shared
+# database, so every worker process derives the same version for the same data,
+# and an ETag validates whichever worker answers. change_log ids are
+# AUTOINCREMENT and start from the clock (migration v5), so a version is never
+# reused, not even by a recreated database.
+_lock = threading.Lock()
+_course_versions: dict[int, int] = {}
+# Version of every course not in _course_versions: the change id at startup or the last reset
+_floor = 0
+
+def bump_courses(course_ids: Iterable[int | None], version: int):
+    """Mark the given courses as changed by change `version`."""
+    with _lock:
+        for cid in course_ids:
+            if cid is not None:
+                # Changes can arrive out of order (our own before another worker's older one)
+                _course_versions[cid] = max(version, _course_versions.get(cid, _floor))
+
+def bump_all(version: int):
+    """Mark every course as changed by change `version`, e.g. after a bulk import."""
+    global _floor
+    with _lock:
+        _floor = max(_floor, version)
+        for cid in [cid for cid, v in _course_versions.items() if v <= _floor]:
+            del _course_versions[cid]
+
+def course_version(course_id: int) -> int:
+    return _course_versions.get(course_id, _floor)
+
+def _digest(text: str, size: int) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()[:size]
+
+def course_etag(course_id: int, variant: str = "") -> str:
+    """`variant` distinguishes differently filtered or paged views of the same course (e.g. the query string)."""
+    suffix = f"-{_digest(variant, 12)}" if variant else ""
+    return f'"c{course_id}-{course_version(course_id)}{suffix}"'
+
+def courses_etag(course_ids: Iterable[int], variant: str = "") -> str:
+    """One tag covering a set of courses, e.g. everything on a student's feed."""
+    parts = ",".join(f"{cid}:{course_version(cid)}" for cid in sorted(set(course_ids)))
+    return '"f-' + _digest(f"{parts}|{variant}", 20) + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False